@@ -1,8 +1,13 @@
+from __future__ import annotations
+
 import dataclasses
-from typing import Dict, Tuple, Callable, Iterable, Union
+import sys
+from typing import Dict, Tuple, Callable, Iterable, List, Union
+
+from aoc.lazy import LazyModule
 
-import numpy as np
-from matplotlib import pyplot as plt
+np = LazyModule("numpy")
+plt = LazyModule("matplotlib.pyplot")
 
 Coordinates = Tuple
 Number = Union[int, float]
@@ -35,24 +40,80 @@ class CoordRanges2D:
 
 
 class UnstructuredGrid:
+    """Cells kept in a dict keyed by (x, y).
+
+    Cells set through `set_cell` (or item assignment) update the bounds and
+    are marked dirty, so `render_ascii` and `display_as_plot` only redraw
+    what changed since their previous frame, in buffers kept between
+    frames. Both expect the same map function from one frame to the next.
+    Cells added to the dict directly are picked up by a full rescan, next
+    time the number of cells does not match.
+
+    Nothing is tracked for a renderer that has no buffer yet, and once more
+    than `full_redraw_fraction` of the cells are dirty, tracking stops
+    (the dirty set becomes None) until the next full redraw, so a grid that
+    is updated but never rendered does not grow a dirty set.
+    """
+
+    full_redraw_fraction = 0.5
+
     def __init__(self, data_dict: Dict[Coordinates, CellData]):
         self._data_dict = data_dict
+        self._limits = None
+        self._num_tracked_cells = 0
+        self._dirty_ascii = set()
+        self._dirty_plot = set()
+        self._ascii_rows = None
+        self._ascii_frame = None
+        self._image = None
+        self._image_frame = None
+        self._plot = None
+
+    def __getitem__(self, coords: Coordinates) -> CellData:
+        return self._data_dict[coords]
+
+    def __setitem__(self, coords: Coordinates, cell_data: CellData):
+        self.set_cell(coords, cell_data)
+
+    def __contains__(self, coords: Coordinates):
+        return coords in self._data_dict
+
+    def set_cell(self, coords: Coordinates, cell_data: CellData):
+        tracked = self._limits is not None and self._num_tracked_cells == len(self._data_dict)
+        self._data_dict[coords] = cell_data
+        if tracked:
+            self._num_tracked_cells = len(self._data_dict)
+            self._extend_limits(self._limits, coords)
+        if self._ascii_rows is not None:
+            self._dirty_ascii = self._mark_dirty(self._dirty_ascii, coords)
+        if self._image is not None:
+            self._dirty_plot = self._mark_dirty(self._dirty_plot, coords)
+
+    def _mark_dirty(self, dirty, coords: Coordinates):
+        """Add `coords` to a dirty set, and return the set, or None once a full redraw is cheaper."""
+        if dirty is None:
+            return None
+        dirty.add(coords)
+        if len(dirty) > self.full_redraw_fraction * len(self._data_dict):
+            return None
+        return dirty
 
     def render_ascii(
         self, map_function: Callable[[CellData], ASCIIChar], missing_cell_char: str
     ):
-        render: str = ""
-        tiles_as_dict = self._data_dict
         limits = self.get_min_max_tile_coords()
-        for y in limits.y_range_reversed():
-            for x in limits.x_range():
-                if not (x, y) in self._data_dict:
-                    char = missing_cell_char
-                else:
-                    tile_object = tiles_as_dict[(x, y)]
-                    char = map_function(tile_object)
-                render += char
-            render += "\n"
+        frame = (limits, missing_cell_char)
+        if self._ascii_rows is None or self._ascii_frame != frame or self._dirty_ascii is None:
+            width, height = limits.x_max - limits.x_min + 1, limits.y_max - limits.y_min + 1
+            self._ascii_rows = [[missing_cell_char] * width for _ in range(max(height, 0))]
+            self._ascii_frame = frame
+            changed = self._data_dict
+        else:
+            changed = self._dirty_ascii
+        for x, y in changed:
+            self._ascii_rows[limits.y_max - y][x - limits.x_min] = map_function(self._data_dict[(x, y)])
+        self._dirty_ascii = set()
+        render: str = "".join("".join(row) + "\n" for row in self._ascii_rows)
         print(render)
         return render
 
@@ -63,24 +124,266 @@ class UnstructuredGrid:
         animate_pause=None,
     ):
         range = self.get_min_max_tile_coords()
-        np_array = np.full(range.shape_reversed, missing_cell_number)
-        for coords, cell_data in self._data_dict.items():
+        frame = (range, missing_cell_number)
+        if self._image is None or self._image_frame[1] != missing_cell_number or self._dirty_plot is None:
+            self._image = np.full(range.shape_reversed, missing_cell_number)
+            changed = self._data_dict
+        elif self._image_frame[0] != range:
+            # the grid grew: move the previous frame into a larger buffer
+            previous, previous_range = self._image, self._image_frame[0]
+            self._image = np.full(range.shape_reversed, missing_cell_number)
+            row = range.y_max - previous_range.y_max
+            col = previous_range.x_min - range.x_min
+            self._image[row:row + previous.shape[0], col:col + previous.shape[1]] = previous
+            changed = self._dirty_plot
+        else:
+            changed = self._dirty_plot
+        for coords in changed:
             row = range.y_max - coords[1]
             col = coords[0] - range.x_min
-            np_array[row, col] = map_function(cell_data)
-        plt.clf()
-        plt.imshow(np_array)
+            self._image[row, col] = map_function(self._data_dict[coords])
+        self._dirty_plot = set()
+        if self._plot is not None and self._image_frame == frame and plt.gcf().axes:
+            self._plot.set_data(self._image)
+            self._plot.autoscale()
+        else:
+            plt.clf()
+            self._plot = plt.imshow(self._image)
+        self._image_frame = frame
         plt.draw()
         if animate_pause is not None:
             plt.pause(animate_pause)
 
     def get_min_max_tile_coords(self) -> CoordRanges2D:
-        limits = CoordRanges2D(
-            x_min=9999999, x_max=-9999999, y_min=9999999, y_max=-9999999
+        if self._limits is None or self._num_tracked_cells != len(self._data_dict):
+            self._limits = CoordRanges2D(
+                x_min=9999999, x_max=-9999999, y_min=9999999, y_max=-9999999
+            )
+            for coords in self._data_dict:
+                self._extend_limits(self._limits, coords)
+            self._num_tracked_cells = len(self._data_dict)
+            # cells may have changed behind our back, redraw everything
+            self._ascii_rows = None
+            self._image = None
+        return dataclasses.replace(self._limits)
+
+    @staticmethod
+    def _extend_limits(limits: CoordRanges2D, coords: Coordinates):
+        x, y = coords
+        limits.x_min = min(limits.x_min, x)
+        limits.x_max = max(limits.x_max, x)
+        limits.y_min = min(limits.y_min, y)
+        limits.y_max = max(limits.y_max, y)
+
+
+class ChunkedGrid:
+    """Dense grid of numbers, stored in square NumPy chunks allocated on demand.
+
+    Coordinates can be negative and the grid grows without bounds, while
+    memory and iteration scale with the chunks touched, at a few bytes per
+    cell. Cells equal to `missing_value` count as missing. It has the
+    rendering API of `UnstructuredGrid`, with map functions applied once
+    per distinct value rather than once per cell.
+    """
+
+    def __init__(self, chunk_size: int = 64, dtype="int8", missing_value: Number = -1):
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self.missing_value = missing_value
+        # (chunk x, chunk y) -> chunk, indexed [y, x] within the chunk
+        self._chunks: Dict[Coordinates, np.ndarray] = dict()
+        self._limits = None
+
+    def _chunk_key(self, x, y):
+        return x // self.chunk_size, y // self.chunk_size
+
+    def __getitem__(self, coords: Coordinates) -> Number:
+        x, y = coords
+        chunk = self._chunks.get(self._chunk_key(x, y))
+        if chunk is None:
+            return self.missing_value
+        return chunk[y % self.chunk_size, x % self.chunk_size]
+
+    def __setitem__(self, coords: Coordinates, value: Number):
+        x, y = coords
+        key = self._chunk_key(x, y)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = np.full((self.chunk_size, self.chunk_size), self.missing_value, dtype=self.dtype)
+            self._chunks[key] = chunk
+        chunk[y % self.chunk_size, x % self.chunk_size] = value
+        if self._limits is None:
+            self._limits = CoordRanges2D(x_min=x, x_max=x, y_min=y, y_max=y)
+        else:
+            UnstructuredGrid._extend_limits(self._limits, coords)
+
+    def __contains__(self, coords: Coordinates):
+        return self[coords] != self.missing_value
+
+    def __len__(self):
+        return sum(int(np.count_nonzero(chunk != self.missing_value)) for chunk in self._chunks.values())
+
+    def items(self) -> Iterable[Tuple[Coordinates, Number]]:
+        for (chunk_x, chunk_y), chunk in self._chunks.items():
+            ys, xs = np.nonzero(chunk != self.missing_value)
+            for y, x in zip(ys.tolist(), xs.tolist()):
+                yield (chunk_x * self.chunk_size + x, chunk_y * self.chunk_size + y), chunk[y, x].item()
+
+    def memory_in_bytes(self):
+        return sum(chunk.nbytes for chunk in self._chunks.values())
+
+    def get_min_max_tile_coords(self) -> CoordRanges2D:
+        if self._limits is None:
+            return CoordRanges2D(x_min=9999999, x_max=-9999999, y_min=9999999, y_max=-9999999)
+        return dataclasses.replace(self._limits)
+
+    def to_array(self, limits: CoordRanges2D = None) -> np.ndarray:
+        """Return the cells within `limits` (all of them by default) as one array indexed [y - y_min, x - x_min]."""
+        limits = limits or self.get_min_max_tile_coords()
+        array = np.full(
+            (max(limits.y_max - limits.y_min + 1, 0), max(limits.x_max - limits.x_min + 1, 0)),
+            self.missing_value,
+            dtype=self.dtype,
         )
-        for x, y in self._data_dict:
-            limits.x_min = min(limits.x_min, x)
-            limits.x_max = max(limits.x_max, x)
-            limits.y_min = min(limits.y_min, y)
-            limits.y_max = max(limits.y_max, y)
-        return limits
+        size = self.chunk_size
+        for (chunk_x, chunk_y), chunk in self._chunks.items():
+            x0 = max(chunk_x * size, limits.x_min)
+            x1 = min(chunk_x * size + size, limits.x_max + 1)
+            y0 = max(chunk_y * size, limits.y_min)
+            y1 = min(chunk_y * size + size, limits.y_max + 1)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            array[y0 - limits.y_min:y1 - limits.y_min, x0 - limits.x_min:x1 - limits.x_min] = chunk[
+                y0 - chunk_y * size:y1 - chunk_y * size, x0 - chunk_x * size:x1 - chunk_x * size
+            ]
+        return array
+
+    def count_neighbours(self, value: Number, diagonal=False) -> np.ndarray:
+        """Return, for every cell within the bounds, how many of its neighbours hold `value`.
+
+        The result is indexed like `to_array`.
+        """
+        matches = np.pad(self.to_array() == value, 1).astype(np.int8)
+        offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        if diagonal:
+            offsets += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+        height, width = matches.shape[0] - 2, matches.shape[1] - 2
+        counts = np.zeros((height, width), dtype=np.int8)
+        for dy, dx in offsets:
+            counts += matches[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+        return counts
+
+    def _lookup(self, array: np.ndarray, map_function: Callable[[Number], object], missing):
+        """Apply `map_function` once per distinct value of `array`."""
+        values, inverse = np.unique(array, return_inverse=True)
+        mapped = [missing if value == self.missing_value else map_function(value.item()) for value in values]
+        return np.array(mapped)[inverse.reshape(array.shape)]
+
+    def render_ascii(
+        self, map_function: Callable[[Number], ASCIIChar], missing_cell_char: str
+    ):
+        # rows from the top (largest y) down, as in UnstructuredGrid
+        chars = self._lookup(self.to_array()[::-1], map_function, missing_cell_char)
+        render: str = "".join("".join(row) + "\n" for row in chars.tolist())
+        print(render)
+        return render
+
+    def display_as_plot(
+        self,
+        map_function: Callable[[Number], Number],
+        missing_cell_number: Number = -1,
+        animate_pause=None,
+    ):
+        image = self._lookup(self.to_array()[::-1], map_function, missing_cell_number)
+        plt.clf()
+        plt.imshow(image)
+        plt.draw()
+        if animate_pause is not None:
+            plt.pause(animate_pause)
+
+
+class StreamingASCIIRenderer:
+    """Write frames of small integer codes (e.g. tile types) to a text stream as characters.
+
+    Codes become characters through a lookup table over the whole NumPy
+    buffer at once, and every row of the frame is turned into a string
+    without a Python loop over cells. Rows are written `rows_per_write` at
+    a time. With `frame_diff`, only the rows that changed since the
+    previous frame are written, each prefixed with the ANSI escape moving
+    the cursor to its line, so a terminal shows the updated frame. A new
+    shape (or the first frame) clears the screen and writes everything.
+    """
+
+    clear_screen = "\x1b[2J\x1b[H"
+
+    def __init__(
+        self,
+        chars: Dict[int, ASCIIChar],
+        missing_cell_char: ASCIIChar = "?",
+        stream=None,
+        frame_diff=False,
+        rows_per_write=64,
+    ):
+        self.offset = min(chars)
+        self.lookup = np.full(max(chars) - self.offset + 1, ord(missing_cell_char), dtype=np.uint32)
+        for code, char in chars.items():
+            self.lookup[code - self.offset] = ord(char)
+        self.missing_code = ord(missing_cell_char)
+        # None writes to whatever sys.stdout is at the time
+        self._stream = stream
+        self.frame_diff = frame_diff
+        self.rows_per_write = rows_per_write
+        self.previous_frame = None
+        self.previous_header = None
+
+    @property
+    def stream(self):
+        return self._stream or sys.stdout
+
+    def to_chars(self, buffer: np.ndarray) -> np.ndarray:
+        """Return the code points of the characters for `buffer`."""
+        indices = np.asarray(buffer, dtype=np.int64) - self.offset
+        known = (indices >= 0) & (indices < len(self.lookup))
+        return np.where(known, self.lookup[np.where(known, indices, 0)], self.missing_code).astype(np.uint32)
+
+    @staticmethod
+    def rows_as_strings(chars: np.ndarray) -> List[str]:
+        if chars.shape[1] == 0:
+            return [""] * chars.shape[0]
+        # each row of UCS4 code points is one fixed-width numpy string
+        return np.ascontiguousarray(chars).view(f"<U{chars.shape[1]}")[:, 0].tolist()
+
+    def render(self, buffer: np.ndarray, header: str = None) -> int:
+        """Write the frame in `buffer` (row 0 on top), and return how many lines were written."""
+        chars = self.to_chars(buffer)
+        first_row_line = 1 if header is None else 2
+        if not self.frame_diff:
+            lines = ([] if header is None else [header]) + self.rows_as_strings(chars)
+            self.write_lines(line + "\n" for line in lines)
+            return len(lines)
+        full_frame = self.previous_frame is None or self.previous_frame.shape != chars.shape
+        if full_frame:
+            changed_rows = np.arange(chars.shape[0])
+            self.stream.write(self.clear_screen)
+        else:
+            changed_rows = np.flatnonzero((self.previous_frame != chars).any(axis=1))
+        lines = []
+        if header is not None and (full_frame or header != self.previous_header):
+            lines.append(f"\x1b[1;1H\x1b[2K{header}")
+        for row, text in zip(changed_rows.tolist(), self.rows_as_strings(chars[changed_rows])):
+            lines.append(f"\x1b[{row + first_row_line};1H{text}")
+        self.write_lines(lines)
+        self.stream.flush()
+        self.previous_frame = chars
+        self.previous_header = header
+        return len(lines)
+
+    def write_lines(self, lines: Iterable[str]):
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) == self.rows_per_write:
+                self.stream.write("".join(batch))
+                batch = []
+        if batch:
+            self.stream.write("".join(batch))
@@ -0,0 +1,103 @@
+"""Tests of the shared grids, run from the 2019 folder with `python -m aoc.test_grids`."""
+import contextlib
+import io
+import random
+from unittest import TestCase
+
+import matplotlib
+import numpy as np
+
+from aoc.grids import ChunkedGrid, UnstructuredGrid
+
+matplotlib.use("Agg")
+
+
+def full_redraw(cells, render):
+    """Render `cells` on a grid that has never been drawn before."""
+    return render(UnstructuredGrid(dict(cells)))
+
+
+def render_ascii(grid):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return grid.render_ascii(str, "?")
+
+
+def render_plot(grid):
+    grid.display_as_plot(lambda value: value)
+    return grid._image.copy()
+
+
+def test_incremental_rendering(self):
+    randomness = random.Random(16)
+    cells = dict()
+    grid = UnstructuredGrid(cells)
+    grid[(0, 0)] = 0
+    for _ in range(200):
+        # a few updates between frames, sometimes outside of the current bounds
+        for _ in range(randomness.randint(1, 5)):
+            grid[(randomness.randint(-8, 8), randomness.randint(-5, 5))] = randomness.randint(0, 9)
+        self.assertEqual(full_redraw(cells, render_ascii), render_ascii(grid))
+        np.testing.assert_array_equal(full_redraw(cells, render_plot), render_plot(grid))
+    print("Incremental rendering done")
+
+
+def test_dirty_cells_bounded(self):
+    cells = dict()
+    grid = UnstructuredGrid(cells)
+    # nothing rendered yet, so nothing to track
+    for x in range(1000):
+        grid[(x, 0)] = x % 10
+    self.assertEqual(set(), grid._dirty_ascii)
+    render_ascii(grid)
+    # after a frame, tracking stops once a full redraw is cheaper
+    for x in range(400):
+        grid[(x, 0)] = 1
+    self.assertEqual(400, len(grid._dirty_ascii))
+    for x in range(400, 1000):
+        grid[(x, 0)] = 1
+    self.assertIsNone(grid._dirty_ascii)
+    self.assertEqual(full_redraw(cells, render_ascii), render_ascii(grid))
+    grid[(3, 0)] = 7
+    self.assertEqual({(3, 0)}, grid._dirty_ascii)
+    self.assertEqual(full_redraw(cells, render_ascii), render_ascii(grid))
+    print("Dirty cells done")
+
+
+def test_chunked_grid_items(self):
+    # cells on both sides of the chunk boundaries at 0 and +-4, and far from the origin;
+    # (-4, -4) and (-1, -1) share a chunk
+    cells = {(-5, -1): 1, (-4, -4): 2, (-1, -1): 3, (0, 0): 4, (3, 4): 5, (4, -5): 6, (-9, 7): 0}
+    grid = ChunkedGrid(chunk_size=4)
+    for coords, value in cells.items():
+        grid[coords] = value
+    self.assertEqual(cells, dict(grid.items()))
+    self.assertEqual(len(cells), len(grid))
+    self.assertEqual(6, len(grid._chunks))
+    for coords, value in cells.items():
+        self.assertIn(coords, grid)
+        self.assertEqual(value, grid[coords])
+    self.assertNotIn((-2, -1), grid)
+    print("Chunked grid items done")
+
+
+def test_chunked_grid_rendering(self):
+    randomness = random.Random(17)
+    cells = {(randomness.randint(-10, 6), randomness.randint(-9, 5)): randomness.randint(0, 9) for _ in range(60)}
+    chunked = ChunkedGrid(chunk_size=4)
+    for coords, value in cells.items():
+        chunked[coords] = value
+    self.assertEqual(cells, dict(chunked.items()))
+    self.assertEqual(full_redraw(cells, render_ascii), render_ascii(chunked))
+    # a single negative cell, in a chunk of its own
+    single = ChunkedGrid(chunk_size=4)
+    single[(-5, -5)] = 3
+    self.assertEqual("3\n", render_ascii(single))
+    print("Chunked grid rendering done")
+
+
+if __name__ == "__main__":
+    print("*** solving tests ***")
+    test_incremental_rendering(TestCase())
+    test_dirty_cells_bounded(TestCase())
+    test_chunked_grid_items(TestCase())
+    test_chunked_grid_rendering(TestCase())
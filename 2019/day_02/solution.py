@@ -45,15 +45,31 @@ def part_1(inp, noun=12, verb=2):
     return p_1
 
 
-def part_2(inp):
+def part_2(inp, target=19690720):
     for (n, v) in itertools.product(range(100), repeat=2):
         p_1 = part_1(copy.deepcopy(inp), noun=n, verb=v)
-        if p_1 == 19690720:
+        if p_1 == target:
             return 100 * n + v
     p_2 = None
     return p_2
 
 
+def run_noun_verb(inp, noun_verb):
+    return part_1(list(inp), *noun_verb)
+
+
+def part_2_parallel(inp, target=19690720):
+    # imported here, so that the serial parts do not load the process pool machinery
+    from day_09.sweep import sweep
+
+    return sweep(
+        inp,
+        itertools.product(range(100), repeat=2),
+        run_noun_verb,
+        lambda results: next((100 * n + v for (n, v), p_1 in results if p_1 == target), None),
+    )
+
+
 def main(input_file, **kwargs):
     """Solve puzzle and connect part 1 with part 2 if needed."""
     # part 1
@@ -82,6 +98,15 @@ def test_sample_1(self):
     print("***Tests 1 passed so far***")
 
 
+def test_sample_parallel(self):
+    # the noun and verb point at cells holding their own address
+    inp = [1, 0, 0, 0, 99] + list(range(5, 100))
+    self.assertEqual(275, part_2(inp, target=150))
+    self.assertEqual(275, part_2_parallel(inp, target=150))
+    print("***Parallel test passed***")
+
+
 if __name__ == "__main__":
     test_sample_1(TestCase())
+    test_sample_parallel(TestCase())
     main("input")
@@ -1,126 +1,8 @@
 import asyncio
-import copy
 import itertools
-import operator
-from asyncio import queues
-from collections import deque
-from enum import Enum
 from unittest import TestCase
 
-
-class Modes(Enum):
-    POSITION = 0
-    IMMEDIATE = 1
-
-
-class Code:
-
-    def __init__(self, code_raw: int):
-        self.op_code = code_raw % 100
-        modes_str = str(code_raw // 100)[::-1]
-        self.modes = {n: Modes(int(mode_str)) for n, mode_str in enumerate(modes_str)}
-
-    def get_n_mode(self, n: int):
-        return self.modes.get(n, Modes.POSITION)
-
-
-class IntcodeComputer:
-
-    def __init__(self, memory, name=None):
-        self.memory = memory
-        self.position = 0
-        self.max_cycles = 1000000
-        self.stop = False
-        self.input_queue = queues.Queue()
-        self.output_queue = queues.Queue()
-        self.last_output = None
-        self.name = name or ''
-
-    def read_and_skip(self):
-        value = self.memory[self.position]
-        self.position += 1
-        return value
-
-    async def execute(self):
-        self.stop = False
-        num_cycles = 0
-        while num_cycles <= self.max_cycles and not self.stop:
-            await self.process_instruction()
-            num_cycles += 1
-        if num_cycles >= self.max_cycles:
-            raise RecursionError("Reached max cycles.")
-
-    async def process_instruction(self):
-        code_raw = self.read_and_skip()
-        code = Code(code_raw)
-        if code.op_code == 1:
-            self.process_sum(code)
-        elif code.op_code == 2:
-            self.process_mul(code)
-        elif code.op_code == 3:
-            await self.process_consume_input(code)
-        elif code.op_code == 4:
-            await self.process_write_output(code)
-        elif code.op_code == 5:
-            self.process_jump_if_true(code)
-        elif code.op_code == 6:
-            self.process_jump_if_false(code)
-        elif code.op_code == 7:
-            self.process_less_than(code)
-        elif code.op_code == 8:
-            self.process_equal(code)
-        elif code.op_code == 99:
-            self.stop = True
-        else:
-            raise ValueError(f"Unknown code {code.op_code}")
-
-    def process_less_than(self, code):
-        self.process_two_input_function(code, lambda a, b: int(operator.lt(a, b)))
-
-    def process_equal(self, code):
-        self.process_two_input_function(code, lambda a, b: int(operator.eq(a, b)))
-
-    def process_sum(self, code):
-        self.process_two_input_function(code, operator.add)
-
-    def process_mul(self, code):
-        self.process_two_input_function(code, operator.mul)
-
-    def process_jump_if_true(self, code):
-        first, second = self.read_n_parameter_values(code, 2)
-        if first != 0:
-            self.position = second
-
-    def process_jump_if_false(self, code):
-        first, second = self.read_n_parameter_values(code, 2)
-        if first == 0:
-            self.position = second
-
-    async def process_consume_input(self, code):
-        value_to_consume = await self.input_queue.get()
-        # print(f'{self.name}: consuming input {value_to_consume}')
-        self.memory[self.read_and_skip()] = value_to_consume
-
-    async def process_write_output(self, code):
-        value = self.read_n_parameter_values(code, 1)[0]
-        # print(f'{self.name}: output: {value}')
-        self.last_output = value
-        await self.output_queue.put(value)
-
-    def process_two_input_function(self, code, f: callable):
-        params = self.read_n_parameter_values(code, 2)
-        output_address = self.read_and_skip()
-        self.memory[output_address] = f(*params)
-
-    def read_n_parameter_values(self, code: Code, number_of_parameter_values_to_get: int):
-        values = []
-        for n in range(number_of_parameter_values_to_get):
-            mode_n = code.get_n_mode(n)
-            if mode_n is Modes.POSITION:
-                values.append(self.memory[self.read_and_skip()])
-            else:
-                values.append(self.read_and_skip())
-        return values
+from day_09.solution import IntcodeComputer
 
 
 async def part_1(inp, phases=None, link_function=None):
@@ -139,17 +21,46 @@ async def part_1(inp, phases=None, link_function=None):
 
     max_second_input = 0
     for phase_combo in itertools.permutations(phases):
-        amplifiers = await instantiate_amplifiers(inp, num_amplifiers)
-        await link_function(amplifiers, num_amplifiers)
-        await set_phase(amplifiers, phase_combo)
-        await amplifiers[0].input_queue.put(0)
-        tasks = await create_amplifier_tasks(amplifiers)
-        await tasks[-1]
-        signal = await get_final_output_from_last_amplifier(amplifiers)
+        signal = await amplify(inp, phase_combo, link_function)
         max_second_input = max(max_second_input, signal)
     return max_second_input
 
 
+async def amplify(inp, phase_combo, link_function):
+    num_amplifiers = len(phase_combo)
+    amplifiers = await instantiate_amplifiers(inp, num_amplifiers)
+    await link_function(amplifiers, num_amplifiers)
+    await set_phase(amplifiers, phase_combo)
+    await amplifiers[0].input_queue.put(0)
+    tasks = await create_amplifier_tasks(amplifiers)
+    await tasks[-1]
+    return await get_final_output_from_last_amplifier(amplifiers)
+
+
+def amplify_in_worker(inp, phase_combo_and_link_function):
+    return asyncio.run(amplify(inp, *phase_combo_and_link_function))
+
+
+def part_1_parallel(inp, phases=None, link_function=None):
+    """Same as part_1, spreading the phase permutations over worker processes."""
+    # imported here, so that the serial parts do not load the process pool machinery
+    from day_09.sweep import sweep
+
+    phases = phases or range(5)
+    link_function = link_function or link_amplifiers_part_1
+    return sweep(
+        inp,
+        ((phase_combo, link_function) for phase_combo in itertools.permutations(phases)),
+        amplify_in_worker,
+        lambda results: max(signal for _, signal in results),
+        chunk_size=8,
+    )
+
+
+def part_2_parallel(inp):
+    return part_1_parallel(inp, range(5, 10), link_amplifiers_part_2)
+
+
 async def get_final_output_from_last_amplifier(amplifiers):
     signal = amplifiers[-1].last_output
     # The last amplifier could end the program, but the first amplifier might consume
@@ -160,7 +71,7 @@ async def get_final_output_from_last_amplifier(amplifiers):
 
 
 async def instantiate_amplifiers(inp, num_amplifiers):
-    return [IntcodeComputer(copy.deepcopy(inp), name=f'comp {n}') for n in range(num_amplifiers)]
+    return [IntcodeComputer(list(inp), name=f'comp {n}') for n in range(num_amplifiers)]
 
 
 async def set_phase(amplifiers, phase_combo):
@@ -187,6 +98,37 @@ async def part_2(inp):
     return await part_1(inp, range(5, 10), link_amplifiers_part_2)
 
 
+def part_1_batched(inp, phases=None, feedback_loop=False):
+    """Same as part_1, running the amplifiers of every phase permutation in one lockstep batch."""
+    # imported here, so that the other parts do not load NumPy
+    from day_09.batched import BatchedIntcode
+
+    num_amplifiers = 5
+    phases = phases or range(num_amplifiers)
+    phase_combos = list(itertools.permutations(phases))
+    batch = BatchedIntcode(inp, len(phase_combos) * num_amplifiers)
+    for n, phase_combo in enumerate(phase_combos):
+        for amplifier, phase in enumerate(phase_combo):
+            batch.provide_input(n * num_amplifiers + amplifier, phase)
+        batch.provide_input(n * num_amplifiers, 0)
+    last_signals = [0] * len(phase_combos)
+    while batch.run():
+        for instance in range(batch.num_instances):
+            n, amplifier = divmod(instance, num_amplifiers)
+            signals = batch.take_outputs(instance)
+            if amplifier == num_amplifiers - 1 and signals:
+                last_signals[n] = signals[-1]
+                if not feedback_loop:
+                    continue
+            for signal in signals:
+                batch.provide_input(n * num_amplifiers + (amplifier + 1) % num_amplifiers, signal)
+    return max(last_signals)
+
+
+def part_2_batched(inp):
+    return part_1_batched(inp, range(5, 10), feedback_loop=True)
+
+
 def read_input(filename):
     with open(filename) as f:
         lines = [line.strip() for line in f.readlines() if line.strip()]
@@ -212,6 +154,8 @@ def main(input_file):
 def test_sample_1(self):
     inp = [3, 15, 3, 16, 1002, 16, 10, 16, 1, 16, 15, 15, 4, 15, 99, 0, 0]
     self.assertEqual(43210, asyncio.run(part_1(inp)))
+    self.assertEqual(43210, part_1_batched(inp))
+    self.assertEqual(43210, part_1_parallel(inp))
     print('Sample 1 done')
 
 
@@ -219,6 +163,8 @@ def test_sample_2(self):
     inp = [3, 23, 3, 24, 1002, 24, 10, 24, 1002, 23, -1, 23,
            101, 5, 23, 23, 1, 24, 23, 23, 4, 23, 99, 0, 0]
     self.assertEqual(54321, asyncio.run(part_1(inp)))
+    self.assertEqual(54321, part_1_batched(inp))
+    self.assertEqual(54321, part_1_parallel(inp))
     print('Sample 2 done')
 
 
@@ -226,6 +172,8 @@ def test_sample_3(self):
     inp = [3, 31, 3, 32, 1002, 32, 10, 32, 1001, 31, -2, 31, 1007, 31, 0, 33,
            1002, 33, 7, 33, 1, 33, 31, 31, 1, 32, 31, 31, 4, 31, 99, 0, 0, 0]
     self.assertEqual(65210, asyncio.run(part_1(inp)))
+    self.assertEqual(65210, part_1_batched(inp))
+    self.assertEqual(65210, part_1_parallel(inp))
     print('Sample 3 done')
 
 
@@ -233,6 +181,8 @@ def test_sample_4(self):
     inp = [3, 26, 1001, 26, -4, 26, 3, 27, 1002, 27, 2, 27, 1, 27, 26,
            27, 4, 27, 1001, 28, -1, 28, 1005, 28, 6, 99, 0, 0, 5]
     self.assertEqual(139629729, asyncio.run(part_2(inp)))
+    self.assertEqual(139629729, part_2_batched(inp))
+    self.assertEqual(139629729, part_2_parallel(inp))
     print('Sample 4 done')
 
 def test_sample_5(self):
@@ -240,6 +190,8 @@ def test_sample_5(self):
            -5, 54, 1105, 1, 12, 1, 53, 54, 53, 1008, 54, 0, 55, 1001, 55, 1, 55, 2, 53, 55, 53, 4,
            53, 1001, 56, -1, 56, 1005, 56, 6, 99, 0, 0, 0, 0, 10]
     self.assertEqual(18216, asyncio.run(part_2(inp)))
+    self.assertEqual(18216, part_2_batched(inp))
+    self.assertEqual(18216, part_2_parallel(inp))
     print('Sample 5 done')
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+"""Run many instances of the same Intcode program in lockstep over NumPy arrays.
+
+Every instance is a row of a memory matrix, with its own position and
+relative base. Each step decodes the current instruction of every runnable
+instance at once, and applies each opcode to the rows executing it, so
+instances that took different branches are simply masked out of the opcodes
+they are not running. Input and output stay per instance, through deques and
+lists, since they are the points where the caller routes values around.
+
+Instances running the same program mostly stay in step, so when every
+runnable instance is at the same instruction, with the same modes, only
+that opcode is executed, without masks (`step_uniform`).
+
+This only pays off with many instances and little divergence: on the
+synthetic amplifier workloads of `day_09.benchmark` (600 instances, 5 per
+phase permutation), the batch takes 0.34 s against 0.75 to 0.8 s for the
+serial asyncio amplifiers, for part 1 as for the feedback loop of part 2.
+With a handful of instances, or instances taking different branches, the per step
+NumPy overhead makes it slower than `IntcodeCore`, which is why the day
+modules keep the serial computers as their default.
+
+Values are stored as int64, so unlike `IntcodeCore` arithmetic overflowing
+64 bits wraps around instead of growing.
+"""
+from collections import deque
+from typing import List
+
+import numpy as np
+
+INSTRUCTION_LENGTHS = np.zeros(100, dtype=np.int64)
+for _op_code, _length in {1: 4, 2: 4, 3: 2, 4: 2, 5: 3, 6: 3, 7: 4, 8: 4, 9: 2, 99: 1}.items():
+    INSTRUCTION_LENGTHS[_op_code] = _length
+KNOWN_OP_CODES = INSTRUCTION_LENGTHS > 0
+
+
+class BatchedIntcode:
+
+    def __init__(self, program: List[int], num_instances: int, memory_size: int = 0):
+        width = max(len(program), memory_size, 1)
+        self.memory = np.zeros((num_instances, width), dtype=np.int64)
+        self.memory[:, : len(program)] = program
+        self.position = np.zeros(num_instances, dtype=np.int64)
+        self.relative_base = np.zeros(num_instances, dtype=np.int64)
+        self.halted = np.zeros(num_instances, dtype=bool)
+        self.inputs = [deque() for _ in range(num_instances)]
+        # len(self.inputs[n]) for every instance, to find the waiting ones without a Python loop
+        self.num_inputs = np.zeros(num_instances, dtype=np.int64)
+        self.outputs = [list() for _ in range(num_instances)]
+        self.max_cycles = 1000000
+        self.num_cycles = 0
+
+    @property
+    def num_instances(self):
+        return len(self.position)
+
+    def provide_input(self, instance: int, value: int):
+        self.inputs[instance].append(value)
+        self.num_inputs[instance] += 1
+
+    def take_outputs(self, instance: int) -> List[int]:
+        outputs = self.outputs[instance]
+        self.outputs[instance] = list()
+        return outputs
+
+    def waiting_for_input(self) -> np.ndarray:
+        """Mask of the instances stopped on an input instruction with no input provided."""
+        rows = np.nonzero(~self.halted & (self.num_inputs == 0))[0]
+        waiting = np.zeros(self.num_instances, dtype=bool)
+        waiting[rows[self.read(rows, self.position[rows]) % 100 == 3]] = True
+        return waiting
+
+    def run(self):
+        """Step every instance until each one has halted or is waiting for input.
+
+        Returns the number of lockstep steps taken.
+        """
+        steps = 0
+        while True:
+            runnable = np.nonzero(~self.halted & ~self.waiting_for_input())[0]
+            if len(runnable) == 0:
+                return steps
+            self.step(runnable)
+            steps += 1
+            self.num_cycles += 1
+            if self.num_cycles > self.max_cycles:
+                raise RecursionError("Reached max cycles.")
+
+    def step(self, rows: np.ndarray):
+        position = self.position[rows]
+        relative_base = self.relative_base[rows]
+        raw = self.read(rows, position)
+        if (raw == raw[0]).all():
+            return self.step_uniform(rows, position, relative_base, int(raw[0]))
+        op_code = raw % 100
+        if not KNOWN_OP_CODES[op_code].all():
+            raise ValueError(f"Unknown code {op_code[~KNOWN_OP_CODES[op_code]][0]}")
+        modes = [raw // 100 % 10, raw // 1000 % 10, raw // 10000 % 10]
+        parameters = [self.read(rows, position + n) for n in range(1, 4)]
+        addresses = [
+            np.where(mode == 2, parameter + relative_base, parameter)
+            for mode, parameter in zip(modes, parameters)
+        ]
+        # only dereference the operands the instruction reads, since the others may hold any value
+        dereferenced = [(modes[n] != 1) & (INSTRUCTION_LENGTHS[op_code] > n + 1) for n in range(2)]
+        dereferenced[0] &= op_code != 3
+        first, second = (
+            np.where(dereferenced[n], self.read(rows, np.where(dereferenced[n], addresses[n], 0)), parameters[n])
+            for n in range(2)
+        )
+
+        new_position = position + INSTRUCTION_LENGTHS[op_code]
+        jumps = ((op_code == 5) & (first != 0)) | ((op_code == 6) & (first == 0))
+        new_position[jumps] = second[jumps]
+        new_position[op_code == 99] = position[op_code == 99]
+        self.halted[rows[op_code == 99]] = True
+        self.relative_base[rows] = relative_base + np.where(op_code == 9, first, 0)
+
+        arithmetic = (op_code == 1) | (op_code == 2) | (op_code == 7) | (op_code == 8)
+        values = np.select(
+            [op_code == 1, op_code == 2, op_code == 7],
+            [first + second, first * second, (first < second).astype(np.int64)],
+            (first == second).astype(np.int64),
+        )
+        self.write(rows[arithmetic], addresses[2][arithmetic], values[arithmetic])
+
+        consuming = np.nonzero(op_code == 3)[0]
+        if len(consuming):
+            self.write(rows[consuming], addresses[0][consuming], self.pop_inputs(rows[consuming]))
+        for row, value in zip(rows[op_code == 4], first[op_code == 4]):
+            self.outputs[row].append(int(value))
+
+        self.position[rows] = new_position
+
+    def step_uniform(self, rows: np.ndarray, position: np.ndarray, relative_base: np.ndarray, raw: int):
+        """Execute the instruction `raw`, which every instance in `rows` is at."""
+        op_code = raw % 100
+        if not KNOWN_OP_CODES[op_code]:
+            raise ValueError(f"Unknown code {op_code}")
+        if op_code == 99:
+            self.halted[rows] = True
+            return
+        modes = (raw // 100 % 10, raw // 1000 % 10, raw // 10000 % 10)
+
+        def address(n):
+            parameter = self.read(rows, position + n + 1)
+            return parameter + relative_base if modes[n] == 2 else parameter
+
+        def value(n):
+            return address(n) if modes[n] == 1 else self.read(rows, address(n))
+
+        new_position = position + INSTRUCTION_LENGTHS[op_code]
+        if op_code in (1, 2, 7, 8):
+            first, second = value(0), value(1)
+            if op_code == 1:
+                result = first + second
+            elif op_code == 2:
+                result = first * second
+            elif op_code == 7:
+                result = (first < second).astype(np.int64)
+            else:
+                result = (first == second).astype(np.int64)
+            self.write(rows, address(2), result)
+        elif op_code == 3:
+            self.write(rows, address(0), self.pop_inputs(rows))
+        elif op_code == 4:
+            for row, output in zip(rows, value(0).tolist()):
+                self.outputs[row].append(output)
+        elif op_code in (5, 6):
+            first, second = value(0), value(1)
+            jumps = first != 0 if op_code == 5 else first == 0
+            new_position = np.where(jumps, second, new_position)
+        else:
+            self.relative_base[rows] = relative_base + value(0)
+        self.position[rows] = new_position
+
+    def pop_inputs(self, rows: np.ndarray) -> np.ndarray:
+        self.num_inputs[rows] -= 1
+        return np.array([self.inputs[row].popleft() for row in rows], dtype=np.int64)
+
+    def read(self, rows: np.ndarray, addresses: np.ndarray) -> np.ndarray:
+        if len(addresses) and addresses.min() < 0:
+            raise IndexError(f"Negative address {addresses.min()}")
+        width = self.memory.shape[1]
+        in_range = addresses < width
+        if in_range.all():
+            return self.memory[rows, addresses]
+        return np.where(in_range, self.memory[rows, np.where(in_range, addresses, 0)], 0)
+
+    def write(self, rows: np.ndarray, addresses: np.ndarray, values: np.ndarray):
+        if len(rows) == 0:
+            return
+        if addresses.min() < 0:
+            raise IndexError(f"Negative address {addresses.min()}")
+        self.grow(int(addresses.max()) + 1)
+        self.memory[rows, addresses] = values
+
+    def grow(self, width: int):
+        old_width = self.memory.shape[1]
+        if width <= old_width:
+            return
+        new_width = max(width, 2 * old_width)
+        grown = np.zeros((self.num_instances, new_width), dtype=np.int64)
+        grown[:, :old_width] = self.memory
+        self.memory = grown
@@ -0,0 +1,231 @@
+"""Benchmark the Intcode computer through every 2019 puzzle that uses it.
+
+Run from the 2019 folder:
+
+    python -m day_09.benchmark --output results.json --baseline previous_results.json
+
+Each workload runs on the puzzle input of its day (`day_XX/input`) when there
+is one, and otherwise on a synthetic program from `day_09/benchmark_programs`:
+
+- day_02_search: adds two cells, with 2 * memory[99] only reached by noun
+  and verb 99, so the search tries every pair.
+- busy_loop: reads a value, counts down from 100000, and outputs the value.
+- amplifier: reads a phase and a signal, burns a few hundred instructions,
+  and outputs 10 * signal + phase.
+- feedback_amplifier: the same, five times in a row, for the feedback loop.
+- painting_robot: 3000 steps of reading a colour and painting the other one,
+  turning left and right alternately.
+- arcade: draws a 40 x 24 screen of stripes of every tile type, then a score.
+- maze: a droid in a 41 x 41 maze, with the oxygen system in the far corner.
+- day_23 uses its own synthetic network, `day_23/sample_1.txt`.
+
+Wall time is measured on a plain run; peak memory (Python allocations, via
+tracemalloc) on a second run, since tracing slows everything down.
+Instructions, and the time spent running them (`vm_time_seconds`), are
+counted by every IntcodeCore.run call during the workload, so
+`instructions_per_second` is the speed of the computer alone, without the
+puzzle logic around it (day_11 spends most of its wall time rendering the
+hull, for instance).
+day_02 has its own interpreter, so its noun/verb search is run on
+IntcodeCore here instead of through the day module.
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import importlib
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, List, Optional
+
+from day_09.intcode import IntcodeCore, Status
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intcode_benchmark.json")
+
+
+def day_module(day):
+    return importlib.import_module(f"{day}.solution")
+
+
+def search_noun_verb(inp, target=None):
+    """day_02 part 2 on IntcodeCore. The synthetic target is reached by the last noun/verb pair."""
+    if target is None:
+        target = 19690720 if len(inp) > 100 else 2 * inp[99]
+    for noun, verb in itertools.product(range(100), repeat=2):
+        memory = list(inp)
+        memory[1:3] = noun, verb
+        computer = IntcodeCore(memory)
+        if computer.run() is Status.HALTED and computer.memory[0] == target:
+            return 100 * noun + verb
+    return None
+
+
+@dataclasses.dataclass
+class Workload:
+    name: str
+    day: str
+    synthetic_program: str
+    run: Callable[[List[int]], object]
+
+
+def synthetic(name):
+    return os.path.join("day_09", "benchmark_programs", f"{name}.txt")
+
+
+def solve(day, part, *args):
+    return getattr(day_module(day), part)(*args)
+
+
+WORKLOADS = [
+    Workload("day_02 noun/verb search", "day_02", synthetic("day_02_search"), search_noun_verb),
+    Workload("day_05 part 1", "day_05", synthetic("busy_loop"), lambda inp: solve("day_05", "part_1", inp, deque([1]))),
+    Workload("day_05 part 2", "day_05", synthetic("busy_loop"), lambda inp: solve("day_05", "part_1", inp, deque([5]))),
+    Workload("day_07_async part 1", "day_07_async", synthetic("amplifier"),
+             lambda inp: asyncio.run(solve("day_07_async", "part_1", inp))),
+    Workload("day_07_async part 2", "day_07_async", synthetic("feedback_amplifier"),
+             lambda inp: asyncio.run(solve("day_07_async", "part_2", inp))),
+    Workload("day_09 part 1", "day_09", synthetic("busy_loop"), lambda inp: solve("day_09", "part_1", inp)),
+    Workload("day_09 part 2", "day_09", synthetic("busy_loop"), lambda inp: solve("day_09", "part_2", inp)),
+    Workload("day_11 part 1", "day_11", synthetic("painting_robot"), lambda inp: solve("day_11", "part_1", inp)),
+    Workload("day_13 part 1", "day_13", synthetic("arcade"), lambda inp: solve("day_13", "part_1", inp)),
+    Workload("day_15 parts 1 and 2", "day_15", synthetic("maze"), lambda inp: solve("day_15", "part_1_and_2", inp)),
+    Workload("day_23 part 1", "day_23", "day_23/sample_1.txt", lambda inp: solve("day_23", "part_1", inp)),
+    Workload("day_23 part 2", "day_23", "day_23/sample_1.txt", lambda inp: solve("day_23", "part_2", inp)),
+]
+
+
+def read_program(filename):
+    with open(filename) as f:
+        return [int(val) for val in f.read().strip().split(",")]
+
+
+def load_program(workload: Workload):
+    puzzle_input = os.path.join(ROOT, workload.day, "input")
+    if os.path.exists(puzzle_input):
+        return "input", read_program(puzzle_input)
+    return "synthetic", read_program(os.path.join(ROOT, workload.synthetic_program))
+
+
+@contextlib.contextmanager
+def counting_instructions(counter: list):
+    """Add the instructions executed by every IntcodeCore.run call to counter[0], and their time to counter[1]."""
+    original_run = IntcodeCore.run
+
+    def run(self):
+        before = self.num_cycles
+        started = time.perf_counter()
+        try:
+            return original_run(self)
+        finally:
+            counter[1] += time.perf_counter() - started
+            counter[0] += self.num_cycles - before
+
+    IntcodeCore.run = run
+    try:
+        yield
+    finally:
+        IntcodeCore.run = original_run
+
+
+def measure(workload: Workload, with_memory=True):
+    source, program = load_program(workload)
+    counter = [0, 0.0]
+    with contextlib.redirect_stdout(io.StringIO()), counting_instructions(counter):
+        started = time.perf_counter()
+        workload.run(list(program))
+        wall_time = time.perf_counter() - started
+    peak_memory = None
+    if with_memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                workload.run(list(program))
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    instructions, vm_time = counter
+    return {
+        "source": source,
+        "wall_time_seconds": wall_time,
+        "vm_time_seconds": vm_time,
+        "instructions": instructions,
+        "instructions_per_second": instructions / vm_time if vm_time else None,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names: Optional[List[str]] = None, with_memory=True):
+    results = dict()
+    for workload in WORKLOADS:
+        if names and not any(name in workload.name for name in names):
+            continue
+        results[workload.name] = measure(workload, with_memory=with_memory)
+        print(format_result(workload.name, results[workload.name]))
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def format_result(name, result, baseline=None):
+    line = (
+        f"{name:<26} {result['wall_time_seconds']:8.3f} s "
+        f"{result['vm_time_seconds']:8.3f} s in VM "
+        f"{result['instructions']:>11} instr "
+        f"{(result['instructions_per_second'] or 0):>12.0f} instr/s"
+    )
+    if result["peak_memory_bytes"] is not None:
+        line += f" {result['peak_memory_bytes'] / 1e6:8.2f} MB"
+    if baseline is not None and baseline["source"] == result["source"]:
+        line += f"  x{baseline['wall_time_seconds'] / result['wall_time_seconds']:.2f} vs baseline"
+        if baseline.get("vm_time_seconds") and result["vm_time_seconds"]:
+            line += f" (VM x{baseline['vm_time_seconds'] / result['vm_time_seconds']:.2f})"
+    return line
+
+
+def compare(report, baseline_report):
+    print(f"Compared with {baseline_report.get('commit')} ({baseline_report.get('time')}):")
+    for name, result in report["results"].items():
+        print(format_result(name, result, baseline_report["results"].get(name)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workloads", nargs="*", help="only run workloads whose name contains one of these")
+    parser.add_argument(
+        "--output", default=DEFAULT_OUTPUT, help="where to write the JSON results, next to this script by default"
+    )
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.workloads, with_memory=not args.no_memory)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
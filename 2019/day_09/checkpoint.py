@@ -0,0 +1,44 @@
+"""Serialisable snapshots of an Intcode computer, to pause and resume long runs.
+
+`IntcodeCore.checkpoint` captures everything the program can observe:
+memory, position, relative base, pending inputs, the last output and the
+cycle count, plus whatever the front end keeps in its queues. Decoded,
+fused and compiled instructions are left out, they are rebuilt on demand
+after `IntcodeCore.restore`.
+"""
+import dataclasses
+import json
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclasses.dataclass
+class Checkpoint:
+    memory_backend: str
+    # contiguous memory from address 0, and the cells beyond it
+    memory: List[int]
+    sparse_memory: List[Tuple[int, int]]
+    position: int
+    relative_base: int
+    pending_input: List[int]
+    total_cycles: int
+    last_output: Optional[int] = None
+    # front end queue name -> values waiting in it
+    queues: Dict[str, List[int]] = dataclasses.field(default_factory=dict)
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(dataclasses.asdict(self), **kwargs)
+
+    @classmethod
+    def from_json(cls, text: str) -> "Checkpoint":
+        fields = json.loads(text)
+        fields["sparse_memory"] = [tuple(cell) for cell in fields["sparse_memory"]]
+        return cls(**fields)
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, filename) -> "Checkpoint":
+        with open(filename) as f:
+            return cls.from_json(f.read())
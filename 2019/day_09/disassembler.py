@@ -0,0 +1,275 @@
+"""Disassemble an Intcode program into basic blocks, without running it.
+
+Run from the 2019 folder:
+
+    python -m day_09.disassembler day_13/input
+
+Code is found by following the control flow from address 0. Jumps with an
+immediate target are followed; jumps through memory (position or relative
+mode) are computed jumps, which cannot be followed statically. Intcode
+programs return from subroutines that way, after storing the return address
+with `add <address>, 0` (or `mul <address>, 1`), so when a program has
+computed jumps, constants stored like that are followed as well, as long as
+they decode. Whatever is not reached is data.
+
+Writes in position mode have a known target, and the ones landing on code
+are self-modifying writes. Writes in relative mode could land anywhere. A
+block none of whose cells is a known target of a write, in a program
+without relative writes, can be decoded or compiled once and for all
+(`stable_blocks`).
+"""
+import argparse
+import dataclasses
+from typing import Dict, List, Optional, Set, Tuple
+
+from day_09.fusion import INSTRUCTION_LENGTHS
+
+MNEMONICS = {1: "add", 2: "mul", 3: "in", 4: "out", 5: "jnz", 6: "jz", 7: "lt", 8: "eq", 9: "arb", 99: "halt"}
+JUMPS = (5, 6)
+WRITES = {1: 2, 2: 2, 3: 0, 7: 2, 8: 2}
+MODE_FORMATS = {0: "[{}]", 1: "{}", 2: "[rb{:+d}]"}
+
+
+@dataclasses.dataclass(frozen=True)
+class Instruction:
+    address: int
+    op_code: int
+    modes: Tuple[int, ...]
+    parameters: Tuple[int, ...]
+
+    @property
+    def end(self):
+        return self.address + 1 + len(self.parameters)
+
+    def write_target(self) -> Optional[Tuple[int, int]]:
+        """Return the (mode, parameter) written to, if this instruction writes."""
+        if self.op_code not in WRITES:
+            return None
+        n = WRITES[self.op_code]
+        return self.modes[n], self.parameters[n]
+
+    def always_jumps(self) -> bool:
+        """Return whether this is a jump whose immediate condition always holds, `1105,1,x` or `1106,0,x`."""
+        if self.op_code not in JUMPS or self.modes[0] != 1:
+            return False
+        return (self.parameters[0] != 0) == (self.op_code == 5)
+
+    def stored_constant(self) -> Optional[int]:
+        """Return the value written by `add c, 0` or `mul c, 1` with an immediate c."""
+        if self.op_code not in (1, 2) or self.modes[:2] != (1, 1):
+            return None
+        neutral = 0 if self.op_code == 1 else 1
+        if self.parameters[1] == neutral:
+            return self.parameters[0]
+        if self.parameters[0] == neutral:
+            return self.parameters[1]
+        return None
+
+    def __str__(self):
+        operands = ", ".join(
+            MODE_FORMATS[mode].format(parameter) for mode, parameter in zip(self.modes, self.parameters)
+        )
+        return f"{self.address:6d}: {MNEMONICS[self.op_code]:4s} {operands}"
+
+
+@dataclasses.dataclass
+class BasicBlock:
+    start: int
+    instructions: List[Instruction]
+    # start addresses of the blocks control can continue to, computed jumps excluded
+    successors: List[int]
+
+    @property
+    def end(self):
+        return self.instructions[-1].end
+
+    def cells(self):
+        return range(self.start, self.end)
+
+
+@dataclasses.dataclass
+class Analysis:
+    program_length: int
+    blocks: Dict[int, BasicBlock]
+    code_cells: Set[int]
+    # addresses of the jumps whose target is read from memory
+    computed_jumps: List[int]
+    # (address of the writing instruction, code address written to)
+    self_modifying_writes: List[Tuple[int, int]]
+    # addresses of the instructions writing in relative mode, to targets unknown until run time
+    relative_writes: List[int]
+    # addresses where decoding failed, although the control flow reaches them
+    invalid: List[int]
+
+    def data_cells(self) -> Set[int]:
+        return set(range(self.program_length)) - self.code_cells
+
+    def stable_blocks(self) -> List[int]:
+        """Return the start addresses of the blocks no instruction can rewrite."""
+        if self.relative_writes:
+            return []
+        written = {target for _, target in self.self_modifying_writes}
+        return [start for start, block in sorted(self.blocks.items()) if written.isdisjoint(block.cells())]
+
+    def summary(self):
+        return {
+            "program_length": self.program_length,
+            "blocks": len(self.blocks),
+            "code_cells": len(self.code_cells),
+            "data_cells": len(self.data_cells()),
+            "computed_jumps": len(self.computed_jumps),
+            "self_modifying_writes": len(self.self_modifying_writes),
+            "relative_writes": len(self.relative_writes),
+            "stable_blocks": len(self.stable_blocks()),
+        }
+
+    def listing(self):
+        lines = []
+        for start, block in sorted(self.blocks.items()):
+            successors = ", ".join(str(successor) for successor in block.successors)
+            lines.append(f"block {start} -> {successors or '-'}")
+            lines.extend(str(instruction) for instruction in block.instructions)
+        return "\n".join(lines)
+
+
+def decode(program: List[int], address: int) -> Optional[Instruction]:
+    if not 0 <= address < len(program):
+        return None
+    raw = program[address]
+    op_code = raw % 100
+    if op_code not in INSTRUCTION_LENGTHS or raw < 0:
+        return None
+    num_parameters = INSTRUCTION_LENGTHS[op_code] - 1
+    modes = tuple(raw // 10 ** (n + 2) % 10 for n in range(num_parameters))
+    if raw >= 10 ** (num_parameters + 2) or any(mode > 2 for mode in modes):
+        return None
+    if op_code in WRITES and modes[WRITES[op_code]] == 1:
+        return None
+    if address + num_parameters >= len(program):
+        return None
+    return Instruction(address, op_code, modes, tuple(program[address + 1:address + 1 + num_parameters]))
+
+
+def analyse(program: List[int]) -> Analysis:
+    instructions: Dict[int, Instruction] = dict()
+    leaders = {0}
+    invalid = []
+    stored_constants = explore(program, [0], instructions, leaders, invalid)
+    if any(instruction.op_code in JUMPS and instruction.modes[1] != 1 for instruction in instructions.values()):
+        # follow the return addresses, as far as they decode
+        followed = set()
+        while True:
+            candidates = [
+                constant for constant in set(stored_constants) - followed
+                if constant in instructions or decode(program, constant) is not None
+            ]
+            if not candidates:
+                break
+            followed.update(candidates)
+            leaders.update(candidates)
+            stored_constants = explore(program, candidates, instructions, leaders, [])
+
+    code_cells = set()
+    for instruction in instructions.values():
+        code_cells.update(range(instruction.address, instruction.end))
+
+    computed_jumps = []
+    self_modifying_writes = []
+    relative_writes = []
+    for address, instruction in sorted(instructions.items()):
+        if instruction.op_code in JUMPS and instruction.modes[1] != 1:
+            computed_jumps.append(address)
+        target = instruction.write_target()
+        if target is None:
+            continue
+        mode, parameter = target
+        if mode == 2:
+            relative_writes.append(address)
+        elif parameter in code_cells:
+            self_modifying_writes.append((address, parameter))
+
+    blocks = build_blocks(instructions, leaders & set(instructions))
+    return Analysis(
+        program_length=len(program),
+        blocks=blocks,
+        code_cells=code_cells,
+        computed_jumps=computed_jumps,
+        self_modifying_writes=self_modifying_writes,
+        relative_writes=relative_writes,
+        invalid=sorted(set(invalid)),
+    )
+
+
+def explore(program, pending, instructions, leaders, invalid) -> List[int]:
+    """Decode everything reachable from `pending`, and return the code addresses stored as constants."""
+    stored_constants = []
+    while pending:
+        address = pending.pop()
+        while address not in instructions:
+            instruction = decode(program, address)
+            if instruction is None:
+                invalid.append(address)
+                break
+            instructions[address] = instruction
+            constant = instruction.stored_constant()
+            if constant is not None and 0 <= constant < len(program):
+                stored_constants.append(constant)
+            if instruction.op_code == 99:
+                break
+            if instruction.op_code in JUMPS:
+                if instruction.modes[1] == 1:
+                    target = instruction.parameters[1]
+                    leaders.add(target)
+                    pending.append(target)
+                if instruction.always_jumps():
+                    # whatever follows is only code if something else jumps to it
+                    break
+                leaders.add(instruction.end)
+            address = instruction.end
+    return stored_constants
+
+
+def build_blocks(instructions: Dict[int, Instruction], leaders: Set[int]) -> Dict[int, BasicBlock]:
+    blocks = dict()
+    for start in sorted(leaders):
+        block_instructions = []
+        successors = []
+        address = start
+        while address in instructions:
+            instruction = instructions[address]
+            block_instructions.append(instruction)
+            if instruction.op_code == 99:
+                break
+            if instruction.op_code in JUMPS:
+                if instruction.modes[1] == 1:
+                    successors.append(instruction.parameters[1])
+                if not instruction.always_jumps():
+                    successors.append(instruction.end)
+                break
+            address = instruction.end
+            if address in leaders:
+                successors.append(address)
+                break
+        blocks[start] = BasicBlock(start, block_instructions, [s for s in successors if s in instructions])
+    return blocks
+
+
+def read_program(filename):
+    with open(filename) as f:
+        return [int(val) for val in f.read().strip().split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("program", help="file with a comma separated Intcode program")
+    parser.add_argument("--listing", action="store_true", help="print every block, not only the summary")
+    args = parser.parse_args()
+    analysis = analyse(read_program(args.program))
+    if args.listing:
+        print(analysis.listing())
+    for key, value in analysis.summary().items():
+        print(f"{key:24s}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Fuse common pairs of Intcode instructions into a single handler.
+
+An IntcodeCore created with `fuse=True` looks at the instruction after each
+one it decodes, and when the pair is one of
+
+- a comparison (7/8) followed by a conditional jump (5/6) on the cell the
+  comparison just wrote, or
+- a relative base adjustment (9) followed by an instruction with a
+  relative parameter,
+
+caches a handler running both in one dispatch. Only the op codes and modes
+are cached, parameters are still read from memory, so the core only has to
+forget the pair when any of its cells is written (`fused_cells`). A
+comparison writing into its own pair stops after the write, and leaves the
+jump to the interpreter.
+
+The gain is small, since a fused pair still decodes its parameters one by
+one, so fusion is off by default. On a loop where 4 of every 6
+instructions belong to a fused pair,
+
+    1001,100,1,100, 109,1, 2101,0,99,101, 109,-1, 1007,100,50000,102, 1005,102,0, 4,101, 99
+
+(data from address 100), 9 runs took 0.444 s at best (median 0.521 s)
+fused, against 0.485 s (median 0.583 s) unfused. The `busy_loop`
+benchmark program, without such pairs, took 0.301 s against 0.275 s, and
+day_11 is dominated by rendering the hull rather than by the computer.
+"""
+from day_09.jit import read_cell
+
+INSTRUCTION_LENGTHS = {1: 4, 2: 4, 3: 2, 4: 2, 5: 3, 6: 3, 7: 4, 8: 4, 9: 2, 99: 1}
+IMMEDIATE = 1
+RELATIVE = 2
+
+
+def process_compare_and_jump(core, codes):
+    compare, jump = codes
+    start = core.position - 1
+    first, second = core.read_n_parameter_values(compare, 2)
+    result = int(first < second) if compare.op_code == 7 else int(first == second)
+    core.set_memory_based_on_mode(compare.get_n_mode(2), result)
+    if start not in core.decoded:
+        # the comparison rewrote its own pair
+        return
+    core.num_cycles += 1
+    core.position += 1
+    value, target = core.read_n_parameter_values(jump, 2)
+    if (value != 0) == (jump.op_code == 5):
+        core.position = target
+
+
+def process_adjust_and_next(core, codes):
+    adjust, following = codes
+    core.relative_base += core.read_n_parameter_values(adjust, 1)[0]
+    core.num_cycles += 1
+    core.position += 1
+    return core.handlers[following.op_code](core, following)
+
+
+def find_fusion(core, address, code, following):
+    """Return the fused handler for `code` at `address` followed by `following`, or None."""
+    if code.op_code in (7, 8) and following.op_code in (5, 6):
+        destination_mode = code.get_n_mode(2)
+        if destination_mode.value == IMMEDIATE or following.get_n_mode(0) is not destination_mode:
+            return None
+        memory, overflow = core.memory, core.overflow
+        if read_cell(memory, overflow, address + 3) != read_cell(memory, overflow, address + 5):
+            return None
+        return process_compare_and_jump
+    if code.op_code == 9:
+        parameter_modes = following.modes[:INSTRUCTION_LENGTHS[following.op_code] - 1]
+        if any(mode.value == RELATIVE for mode in parameter_modes):
+            return process_adjust_and_next
+    return None
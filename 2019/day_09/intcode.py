@@ -0,0 +1,471 @@
+"""The Intcode virtual machine shared by every 2019 Intcode puzzle.
+
+`IntcodeCore.run` executes instructions until the program needs an input that
+has not been provided, produces an output, or halts, and returns a `Status`
+saying which. Front ends (`day_09.solution` for asyncio queues,
+`day_09.solution_not_async` for `queue.Queue`, `day_05.solution` for deques)
+only move values between their own queues and the core at those points.
+"""
+import contextlib
+import copy
+import functools
+import operator
+import time
+from collections import defaultdict, deque
+from enum import Enum
+
+from day_09.checkpoint import Checkpoint
+from day_09.fusion import INSTRUCTION_LENGTHS, find_fusion
+from day_09.jit import BlockCompiler
+from day_09.memory import read_out_of_range, write_out_of_range
+from day_09.profiling import IntcodeProfile
+from day_09.transcript import EventKind, Transcript
+
+
+class Status(Enum):
+    NEEDS_INPUT = 0
+    OUTPUT = 1
+    HALTED = 2
+
+
+class Modes(Enum):
+    POSITION = 0
+    IMMEDIATE = 1
+    RELATIVE = 2
+
+
+class Code:
+
+    def __init__(self, code_raw: int):
+        self.op_code = code_raw % 100
+        modes_str = str(code_raw // 100)[::-1].ljust(3, "0")
+        self.modes = tuple(Modes(int(mode_str)) for mode_str in modes_str)
+
+    def get_n_mode(self, n: int):
+        return self.modes[n]
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def decode(cls, code_raw: int) -> "Code":
+        """Decode a raw instruction, sharing the result for equal raw values.
+
+        A Code is never mutated after construction, so one instance per raw
+        value can be reused by every computer and every address.
+        """
+        return cls(code_raw)
+
+
+class IntcodeCore:
+
+    def __init__(self, memory, name=None, memory_backend="list", jit=False, profile=False, record=False,
+                 fuse=False):
+        self.memory, self.overflow = self.load_memory(memory, memory_backend)
+        self.position = 0
+        self.max_cycles = 1000000
+        self.num_cycles = 0
+        # cycles executed before the last reset_cycles
+        self.cycles_before_reset = 0
+        # take a checkpoint every so many cycles, when set, see `checkpoint`
+        self.checkpoint_every = None
+        self.next_checkpoint = None
+        self.last_checkpoint = None
+        self.on_checkpoint = None
+        self.pending_input = deque()
+        self.last_output = None
+        self.name = name or ''
+        self.relative_base = 0
+        # plain functions rather than bound methods, so decoded instructions can be shared by forks
+        cls = type(self)
+        self.handlers = {
+            1: cls.process_sum,
+            2: cls.process_mul,
+            3: cls.process_consume_input,
+            4: cls.process_write_output,
+            5: cls.process_jump_if_true,
+            6: cls.process_jump_if_false,
+            7: cls.process_less_than,
+            8: cls.process_equal,
+            9: cls.process_adjust_relative_base,
+            99: cls.process_halt,
+        }
+        # address -> decoded instruction, dropped whenever the address is written
+        self.decoded = dict()
+        # counter shared by all the forks still using the same memory, None when not shared
+        self.memory_share = None
+        self.jit = None
+        if jit:
+            if self.overflow is None:
+                raise ValueError("JIT mode needs the list memory backend")
+            self.jit = BlockCompiler(self.memory, self.overflow)
+        if fuse and profile:
+            raise ValueError("Profiling counts single instructions, and cannot be combined with fusion")
+        self.profile = IntcodeProfile() if profile else None
+        # address -> start addresses of the fused pairs it belongs to, None when not fusing
+        self.fused_cells = defaultdict(set) if fuse else None
+        self.transcript = Transcript() if record else None
+
+    @classmethod
+    def load_memory(cls, memory, memory_backend):
+        """Copy the program into a memory backend: "list" (contiguous) or "dict" (sparse).
+
+        Returns the memory, and the dict holding the cells far past the end
+        of a list memory (None for a dict memory), see `day_09.memory`.
+        """
+        if memory_backend == "list":
+            return list(memory), dict()
+        if memory_backend == "dict":
+            return cls.memory_as_dict(memory), None
+        raise ValueError(f"Unknown memory backend {memory_backend}")
+
+    @staticmethod
+    def memory_as_dict(memory):
+        dict_memory = defaultdict(int)
+        for k, v in enumerate(memory):
+            dict_memory[k] = v
+        return dict_memory
+
+    def reset_cycles(self):
+        """Restart the `max_cycles` budget, keeping count of the cycles in `total_cycles`."""
+        self.cycles_before_reset += self.num_cycles
+        self.num_cycles = 0
+
+    def total_cycles(self):
+        return self.cycles_before_reset + self.num_cycles
+
+    def cycle_limit(self):
+        """Return the `num_cycles` past which `run` has to stop and call `reach_cycle_limit`."""
+        if self.checkpoint_every is None:
+            return self.max_cycles
+        if self.next_checkpoint is None:
+            self.next_checkpoint = self.total_cycles() + self.checkpoint_every
+        return min(self.max_cycles, self.next_checkpoint - self.cycles_before_reset - 1)
+
+    def reach_cycle_limit(self):
+        """Take the checkpoint that is due, or raise RecursionError past `max_cycles`.
+
+        Either way this happens between two instructions, so a checkpoint
+        taken here (or by the caller, after the error) resumes exactly where
+        the run stopped.
+        """
+        self.take_checkpoint()
+        if self.num_cycles > self.max_cycles:
+            raise RecursionError("Reached max cycles.")
+        self.next_checkpoint = self.total_cycles() + self.checkpoint_every
+        return self.cycle_limit()
+
+    def take_checkpoint(self):
+        if self.checkpoint_every is None:
+            return
+        self.last_checkpoint = self.checkpoint()
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(self.last_checkpoint)
+
+    def checkpoint(self) -> Checkpoint:
+        if self.overflow is not None:
+            memory_backend, memory, sparse_memory = "list", list(self.memory), sorted(self.overflow.items())
+        else:
+            memory_backend, memory, sparse_memory = "dict", [], sorted(self.memory.items())
+        return Checkpoint(
+            memory_backend=memory_backend,
+            memory=memory,
+            sparse_memory=sparse_memory,
+            position=self.position,
+            relative_base=self.relative_base,
+            pending_input=list(self.pending_input),
+            total_cycles=self.total_cycles(),
+            last_output=self.last_output,
+        )
+
+    def restore(self, checkpoint: Checkpoint):
+        """Continue from `checkpoint`, dropping the decoded and compiled instructions of the current program."""
+        if self.memory_share is not None:
+            self.memory_share[0] -= 1
+            self.memory_share = None
+        self.memory, self.overflow = self.load_memory(checkpoint.memory, checkpoint.memory_backend)
+        for address, value in checkpoint.sparse_memory:
+            if self.overflow is not None:
+                self.overflow[address] = value
+            else:
+                self.memory[address] = value
+        self.position = checkpoint.position
+        self.relative_base = checkpoint.relative_base
+        self.pending_input = deque(checkpoint.pending_input)
+        self.last_output = checkpoint.last_output
+        self.cycles_before_reset = checkpoint.total_cycles
+        self.num_cycles = 0
+        self.next_checkpoint = None
+        self.decoded = dict()
+        if self.fused_cells is not None:
+            self.fused_cells = defaultdict(set)
+        if self.jit is not None:
+            self.jit = BlockCompiler(self.memory, self.overflow)
+
+    def read_and_skip(self):
+        try:
+            value = self.memory[self.position]
+        except IndexError:
+            value = read_out_of_range(self.memory, self.overflow, self.position)
+        self.position += 1
+        return value
+
+    def provide_input(self, value):
+        self.pending_input.append(value)
+
+    def run(self) -> Status:
+        """Execute until an input is missing, an output is produced or the program halts.
+
+        The output value is left in `last_output`. Front ends call `reset_cycles`
+        when they see fit; `max_cycles` caps `num_cycles` as a safety limit.
+        With `checkpoint_every` set, a checkpoint is kept in `last_checkpoint`
+        (and passed to `on_checkpoint`) every so many cycles, and when the
+        limit is hit.
+        """
+        if self.profile is not None:
+            return self.run_profiled()
+        limit = self.cycle_limit()
+        while True:
+            if self.num_cycles > limit:
+                limit = self.reach_cycle_limit()
+            if self.jit is not None:
+                executed = self.run_compiled_block()
+                if executed:
+                    self.num_cycles += executed
+                    continue
+            self.num_cycles += 1
+            status = self.process_instruction()
+            if status is not None:
+                return status
+
+    def run_profiled(self) -> Status:
+        """Same as `run`, also filling in `self.profile`."""
+        profile = self.profile
+        started = time.perf_counter()
+        limit = self.cycle_limit()
+        try:
+            while True:
+                if self.num_cycles > limit:
+                    limit = self.reach_cycle_limit()
+                position = self.position
+                if self.jit is not None and self.jit.block_at(position) is not None:
+                    instructions = self.jit.block_instructions[position]
+                    executed = self.run_compiled_block()
+                    self.num_cycles += executed
+                    profile.record_block(instructions[:executed])
+                    continue
+                decoded = self.decoded.get(position) or self.decode_instruction(position)
+                self.num_cycles += 1
+                status = self.process_instruction()
+                if status is not Status.NEEDS_INPUT:
+                    # a blocked input is retried, and counted, once the input arrives
+                    profile.record(position, decoded[1].op_code)
+                if status is not None:
+                    return status
+        finally:
+            profile.run_time += time.perf_counter() - started
+
+    def waiting_for_io(self):
+        """Context for front ends waiting on their queues, timed when profiling."""
+        if self.profile is None:
+            return contextlib.nullcontext()
+        return self.profile.waiting_for_io()
+
+    def process_instruction(self):
+        decoded = self.decoded.get(self.position)
+        if decoded is None:
+            decoded = self.decode_instruction(self.position)
+        handler, code = decoded
+        self.position += 1
+        return handler(self, code)
+
+    def run_compiled_block(self):
+        """Run the compiled block at the current position and return how many instructions it ran.
+
+        Returns 0 when there is no block there, and the instruction has to be interpreted.
+        """
+        block = self.jit.block_at(self.position)
+        if block is None:
+            return 0
+        if self.memory_share is not None:
+            self.unshare_memory()
+        self.position, self.relative_base, executed, written_code_address = block(
+            self.memory, self.overflow, self.relative_base, self.jit.code_owner
+        )
+        if written_code_address is not None:
+            self.jit.invalidate(written_code_address)
+            self.decoded.pop(written_code_address, None)
+        return executed
+
+    def decode_instruction(self, address):
+        if address < 0:
+            raise IndexError(f"Negative address {address}")
+        try:
+            code = Code.decode(self.memory[address])
+        except IndexError:
+            code = Code.decode(read_out_of_range(self.memory, self.overflow, address))
+        handler = self.handlers.get(code.op_code)
+        if handler is None:
+            raise ValueError(f"Unknown code {code.op_code}")
+        decoded = (handler, code)
+        if self.fused_cells is not None:
+            decoded = self.fuse_instruction(address, code) or decoded
+        self.decoded[address] = decoded
+        return decoded
+
+    def fuse_instruction(self, address, code):
+        """Return the decoded pair starting at `address` when it can be fused, see `day_09.fusion`."""
+        following_address = address + INSTRUCTION_LENGTHS[code.op_code]
+        try:
+            following_raw = self.memory[following_address]
+        except IndexError:
+            following_raw = read_out_of_range(self.memory, self.overflow, following_address)
+        try:
+            following = Code.decode(following_raw)
+        except ValueError:
+            # data, not an instruction
+            return None
+        if following.op_code not in self.handlers:
+            return None
+        handler = find_fusion(self, address, code, following)
+        if handler is None:
+            return None
+        for cell in range(address, following_address + INSTRUCTION_LENGTHS[following.op_code]):
+            self.fused_cells[cell].add(address)
+        return handler, (code, following)
+
+    def process_halt(self, code):
+        # stay on the halt instruction, so that running again halts again
+        self.position -= 1
+        if self.transcript is not None:
+            self.transcript.record(EventKind.HALT, 0, self.total_cycles())
+        return Status.HALTED
+
+    def process_less_than(self, code):
+        self.process_two_input_function(code, lambda a, b: int(operator.lt(a, b)))
+
+    def process_equal(self, code):
+        self.process_two_input_function(code, lambda a, b: int(operator.eq(a, b)))
+
+    def process_sum(self, code):
+        self.process_two_input_function(code, operator.add)
+
+    def process_mul(self, code):
+        self.process_two_input_function(code, operator.mul)
+
+    def process_jump_if_true(self, code):
+        first, second = self.read_n_parameter_values(code, 2)
+        if first != 0:
+            self.position = second
+
+    def process_jump_if_false(self, code):
+        first, second = self.read_n_parameter_values(code, 2)
+        if first == 0:
+            self.position = second
+
+    def process_consume_input(self, code):
+        if not self.pending_input:
+            # retry this instruction, and count it, once an input is provided
+            self.position -= 1
+            self.num_cycles -= 1
+            return Status.NEEDS_INPUT
+        value_to_set = self.pending_input.popleft()
+        if self.transcript is not None:
+            self.transcript.record(EventKind.INPUT, value_to_set, self.total_cycles())
+        output_mode = code.get_n_mode(0)
+        self.set_memory_based_on_mode(output_mode, value_to_set)
+
+    def set_memory_based_on_mode(self, output_mode, value_to_set):
+        if output_mode is Modes.POSITION:
+            self.write_memory(self.read_and_skip(), value_to_set)
+        elif output_mode is Modes.RELATIVE:
+            self.write_memory(self.read_and_skip() + self.relative_base, value_to_set)
+
+    def fork(self):
+        """Return an independent copy of this computer, in its current state.
+
+        Both computers keep reading the same memory until one of them writes
+        to it, and only then does that one take a private copy. Decoded and
+        compiled instructions are copied along, so the fork does not have to
+        warm up again. A profiled computer's fork starts a profile of its own.
+        """
+        if self.memory_share is None:
+            self.memory_share = [1]
+        self.memory_share[0] += 1
+        twin = copy.copy(self)
+        twin.pending_input = deque(self.pending_input)
+        twin.decoded = dict(self.decoded)
+        if self.fused_cells is not None:
+            twin.fused_cells = defaultdict(set, {cell: set(starts) for cell, starts in self.fused_cells.items()})
+        if self.transcript is not None:
+            twin.transcript = self.transcript.copy()
+        if self.jit is not None:
+            twin.jit = self.jit.fork(self.memory, self.overflow)
+        if self.profile is not None:
+            twin.profile = IntcodeProfile()
+        return twin
+
+    def unshare_memory(self):
+        share = self.memory_share
+        self.memory_share = None
+        share[0] -= 1
+        if share[0] > 0:
+            self.memory = self.memory.copy()
+            if self.overflow is not None:
+                self.overflow = dict(self.overflow)
+            if self.jit is not None:
+                self.jit.memory = self.memory
+                self.jit.overflow = self.overflow
+
+    def write_memory(self, address, value):
+        """Write to memory, forgetting any instruction decoded or compiled at that address."""
+        if address < 0:
+            raise IndexError(f"Negative address {address}")
+        if self.memory_share is not None:
+            self.unshare_memory()
+        try:
+            self.memory[address] = value
+        except IndexError:
+            write_out_of_range(self.memory, self.overflow, address, value)
+        self.decoded.pop(address, None)
+        if self.fused_cells is not None:
+            for start in self.fused_cells.pop(address, ()):
+                self.decoded.pop(start, None)
+        if self.jit is not None:
+            self.jit.invalidate(address)
+
+    def process_write_output(self, code):
+        value = self.read_n_parameter_values(code, 1)[0]
+        self.last_output = value
+        if self.transcript is not None:
+            self.transcript.record(EventKind.OUTPUT, value, self.total_cycles())
+        return Status.OUTPUT
+
+    def process_adjust_relative_base(self, code):
+        value = self.read_n_parameter_values(code, 1)[0]
+        self.relative_base += value
+
+    def process_two_input_function(self, code, f: callable):
+        params = self.read_n_parameter_values(code, 2)
+        value_to_set = f(*params)
+        output_mode = code.get_n_mode(2)
+        self.set_memory_based_on_mode(output_mode, value_to_set)
+
+    def read_n_parameter_values(self, code: Code, number_of_parameter_values_to_get: int):
+        values = []
+        for n in range(number_of_parameter_values_to_get):
+            mode_n = code.get_n_mode(n)
+            if mode_n is Modes.IMMEDIATE:
+                values.append(self.read_and_skip())
+                continue
+            if mode_n is Modes.POSITION:
+                address = self.read_and_skip()
+            elif mode_n is Modes.RELATIVE:
+                address = self.read_and_skip() + self.relative_base
+            else:
+                raise ValueError(f'Unknown mode {mode_n}')
+            if address < 0:
+                raise IndexError(f"Negative address {address}")
+            try:
+                values.append(self.memory[address])
+            except IndexError:
+                values.append(read_out_of_range(self.memory, self.overflow, address))
+        return values
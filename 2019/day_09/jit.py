@@ -0,0 +1,163 @@
+"""Compile straight-line runs of Intcode into Python functions.
+
+A block starts at any address the computer jumps to and runs until (and
+including) the first jump, or until (and excluding) the first instruction
+that needs the interpreter: input, output, halt, or anything that does not
+decode. Every compiled block has the signature
+
+    block(m, o, rb, c) -> (position, relative_base, executed, written_code_address)
+
+where `m` is the computer memory, `o` its overflow dict (see
+`day_09.memory`), `rb` the relative base and `c` the map of addresses
+covered by compiled code. Each memory write checks `c`, and if it
+hit compiled code the block stops right after that instruction, so the
+computer can invalidate the stale blocks before carrying on.
+"""
+from collections import defaultdict
+
+from day_09.memory import read_out_of_range, write_out_of_range
+
+MAX_BLOCK_INSTRUCTIONS = 128
+_ARITHMETIC = {1: "{} + {}", 2: "{} * {}", 7: "int({} < {})", 8: "int({} == {})"}
+_JUMPS = {5: "!= 0", 6: "== 0"}
+
+
+def read_cell(memory, overflow, address):
+    if address < 0:
+        raise IndexError(f"Negative address {address}")
+    try:
+        return memory[address]
+    except IndexError:
+        return read_out_of_range(memory, overflow, address)
+
+
+def write_cell(memory, overflow, address, value):
+    if address < 0:
+        raise IndexError(f"Negative address {address}")
+    try:
+        memory[address] = value
+    except IndexError:
+        write_out_of_range(memory, overflow, address, value)
+
+
+class BlockCompiler:
+
+    def __init__(self, memory: list, overflow: dict):
+        self.memory = memory
+        self.overflow = overflow
+        # start address -> compiled block, or None when the interpreter has to run it
+        self.blocks = dict()
+        # address -> start addresses of the blocks it belongs to
+        self.code_owner = defaultdict(set)
+        self.block_cells = dict()
+        # start address -> (position, op code) of each instruction, for profiling
+        self.block_instructions = dict()
+
+    def fork(self, memory, overflow):
+        """Return a compiler for a forked computer, sharing the compiled functions."""
+        twin = BlockCompiler(memory, overflow)
+        twin.blocks = dict(self.blocks)
+        twin.code_owner = defaultdict(set, {cell: set(starts) for cell, starts in self.code_owner.items()})
+        twin.block_cells = dict(self.block_cells)
+        twin.block_instructions = dict(self.block_instructions)
+        return twin
+
+    def block_at(self, address):
+        try:
+            return self.blocks[address]
+        except KeyError:
+            return self.compile_block(address)
+
+    def invalidate(self, address):
+        for start in self.code_owner.pop(address, ()):
+            self.blocks.pop(start, None)
+            self.block_instructions.pop(start, None)
+            for cell in self.block_cells.pop(start, ()):
+                if cell != address:
+                    self.code_owner[cell].discard(start)
+                    if not self.code_owner[cell]:
+                        del self.code_owner[cell]
+
+    def compile_block(self, start):
+        lines, end, instructions = self.translate(start)
+        if lines:
+            source = "def block(m, o, rb, c):\n" + "\n".join(lines) + "\n"
+            namespace = {"rd": read_cell, "wr": write_cell}
+            exec(compile(source, f"<intcode block {start}>", "exec"), namespace)
+            block = namespace["block"]
+        else:
+            # keep the start registered so that rewriting it triggers a recompilation
+            block, end = None, start + 1
+        self.blocks[start] = block
+        self.block_cells[start] = range(start, end)
+        self.block_instructions[start] = instructions
+        for cell in range(start, end):
+            self.code_owner[cell].add(start)
+        return block
+
+    def translate(self, start):
+        """Return the body lines of the block at `start`, the first address past it, and its instructions."""
+        lines = []
+        instructions = []
+        position = start
+        executed = 0
+        while executed < MAX_BLOCK_INSTRUCTIONS:
+            raw = read_cell(self.memory, self.overflow, position)
+            op_code = raw % 100
+            modes = str(raw // 100)[::-1].ljust(3, "0")
+            if op_code not in _ARITHMETIC and op_code not in _JUMPS and op_code != 9:
+                break
+            if set(modes) - {"0", "1", "2"} or (op_code in _ARITHMETIC and modes[2] == "1"):
+                break
+            params = [read_cell(self.memory, self.overflow, position + n) for n in range(1, 4)]
+            executed += 1
+            instructions.append((position, op_code))
+            lines.append(f"    # {position}: {raw} {' '.join(str(p) for p in params)}")
+            if op_code in _ARITHMETIC:
+                value = _ARITHMETIC[op_code].format(
+                    self.operand(modes[0], params[0]), self.operand(modes[1], params[1])
+                )
+                position += 4
+                lines.extend(self.store(modes[2], params[2], value, position, executed))
+            elif op_code == 9:
+                lines.append(f"    rb += {self.operand(modes[0], params[0])}")
+                position += 2
+            else:
+                position += 3
+                condition = f"{self.operand(modes[0], params[0])} {_JUMPS[op_code]}"
+                lines.append(f"    if {condition}:")
+                lines.append(f"        return {self.operand(modes[1], params[1])}, rb, {executed}, None")
+                lines.append(f"    return {position}, rb, {executed}, None")
+                return lines, position, instructions
+        if lines:
+            lines.append(f"    return {position}, rb, {executed}, None")
+        return lines, position, instructions
+
+    def operand(self, mode, parameter):
+        if mode == "1":
+            return str(parameter)
+        if mode == "2":
+            return f"(m[a] if 0 <= (a := rb + {parameter}) < len(m) else rd(m, o, a))"
+        if 0 <= parameter < len(self.memory):
+            # the memory never shrinks, so this address stays in range
+            return f"m[{parameter}]"
+        return f"rd(m, o, {parameter})"
+
+    def store(self, mode, parameter, value, next_position, executed):
+        if mode == "0" and 0 <= parameter < len(self.memory):
+            return [
+                f"    m[{parameter}] = {value}",
+                f"    if {parameter} in c:",
+                f"        return {next_position}, rb, {executed}, {parameter}",
+            ]
+        address = f"rb + {parameter}" if mode == "2" else str(parameter)
+        return [
+            f"    v = {value}",
+            f"    a = {address}",
+            "    if 0 <= a < len(m):",
+            "        m[a] = v",
+            "    else:",
+            "        wr(m, o, a, v)",
+            "    if a in c:",
+            f"        return {next_position}, rb, {executed}, a",
+        ]
@@ -0,0 +1,46 @@
+"""Contiguous Intcode memory: a plain list, with a dict for the cells far past its end.
+
+`IntcodeCore` keeps the list in `memory` and the dict in `overflow`, rather
+than a list subclass, since subscripting a subclass of list skips CPython's
+fast path and costs about as much as a dict lookup. Addresses inside the
+list are read and written with ordinary list indexing. Outside of it the
+list raises IndexError, and the computer falls back to `read_out_of_range`
+and `write_out_of_range`:
+
+- unwritten cells read as 0, like the `defaultdict` backend,
+- writes just past the end grow the list in place (at least doubling it),
+  so compiled blocks holding it keep seeing the same object,
+- writes further than `MAX_GAP` cells past the end go to `overflow`, so a
+  single distant address does not allocate the gap.
+
+Negative addresses are not valid Intcode, and a plain list would wrap them
+around to the end of memory, so they raise IndexError before any indexing.
+"""
+
+MAX_GAP = 1 << 16
+
+
+def read_out_of_range(memory: list, overflow: dict, address: int) -> int:
+    if address < 0:
+        raise IndexError(f"Negative address {address}")
+    return overflow.get(address, 0)
+
+
+def write_out_of_range(memory: list, overflow: dict, address: int, value: int):
+    if address < 0:
+        raise IndexError(f"Negative address {address}")
+    if address - len(memory) > MAX_GAP:
+        overflow[address] = value
+        return
+    grow(memory, overflow, address + 1)
+    memory[address] = value
+
+
+def grow(memory: list, overflow: dict, size: int):
+    old_size = len(memory)
+    new_size = max(size, 2 * old_size)
+    if new_size <= old_size:
+        return
+    memory.extend([0] * (new_size - old_size))
+    for address in [a for a in overflow if a < new_size]:
+        memory[address] = overflow.pop(address)
@@ -0,0 +1,53 @@
+import contextlib
+import json
+import time
+from collections import Counter
+
+
+class IntcodeProfile:
+    """Counters filled in by an IntcodeCore created with `profile=True`.
+
+    Instructions run by compiled blocks are counted one by one too, so the
+    numbers do not depend on whether the JIT is on. `run_time` is the time
+    spent inside `IntcodeCore.run`, and `io_wait_time` the time front ends
+    spent waiting on their queues.
+    """
+
+    def __init__(self):
+        self.op_code_counts = Counter()
+        self.position_hits = Counter()
+        self.instructions = 0
+        self.run_time = 0.0
+        self.io_wait_time = 0.0
+
+    def record(self, position, op_code):
+        self.op_code_counts[op_code] += 1
+        self.position_hits[position] += 1
+        self.instructions += 1
+
+    def record_block(self, instructions):
+        for position, op_code in instructions:
+            self.op_code_counts[op_code] += 1
+            self.position_hits[position] += 1
+        self.instructions += len(instructions)
+
+    @contextlib.contextmanager
+    def waiting_for_io(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.io_wait_time += time.perf_counter() - started
+
+    def as_dict(self, num_hot_positions=20):
+        return {
+            "instructions": self.instructions,
+            "run_time_seconds": self.run_time,
+            "io_wait_time_seconds": self.io_wait_time,
+            "instructions_per_second": self.instructions / self.run_time if self.run_time else None,
+            "op_code_counts": {str(op_code): count for op_code, count in sorted(self.op_code_counts.items())},
+            "hot_positions": self.position_hits.most_common(num_hot_positions),
+        }
+
+    def to_json(self, num_hot_positions=20, **kwargs):
+        return json.dumps(self.as_dict(num_hot_positions), **kwargs)
@@ -1,161 +1,83 @@
 import asyncio
-import operator
 from asyncio import queues
-from collections import defaultdict
-from enum import Enum
 from unittest import TestCase
 
+from day_09.checkpoint import Checkpoint
+from day_09.intcode import IntcodeCore, Status
 
-class Modes(Enum):
-    POSITION = 0
-    IMMEDIATE = 1
-    RELATIVE = 2
 
+class IntcodeComputer(IntcodeCore):
+    """Front end awaiting asyncio queues, only at the points where the core needs I/O."""
 
-class Code:
-
-    def __init__(self, code_raw: int):
-        self.op_code = code_raw % 100
-        modes_str = str(code_raw // 100)[::-1]
-        self.modes = {n: Modes(int(mode_str)) for n, mode_str in enumerate(modes_str)}
-
-    def get_n_mode(self, n: int):
-        return self.modes.get(n, Modes.POSITION)
-
-
-class IntcodeComputer:
-
-    def __init__(self, memory, name=None):
-        self.memory = self.memory_as_dict(memory)
-        self.position = 0
-        self.max_cycles = 1000000
+    def __init__(self, memory, name=None, memory_backend="list", jit=False, profile=False, record=False,
+                 fuse=False):
+        super().__init__(
+            memory, name=name, memory_backend=memory_backend, jit=jit, profile=profile, record=record, fuse=fuse
+        )
         self.stop = False
         self.input_queue = queues.Queue()
         self.output_queue = queues.Queue()
-        self.last_output = None
-        self.name = name or ''
-        self.relative_base = 0
 
-    @staticmethod
-    def memory_as_dict(memory):
-        dict_memory = defaultdict(int)
-        for k, v in enumerate(memory):
-            dict_memory[k] = v
-        return dict_memory
-
-    def read_and_skip(self):
-        value = self.memory[self.position]
-        self.position += 1
-        return value
-
-    async def execute(self):
+    async def execute(self, resume_from: Checkpoint = None):
+        if resume_from is not None:
+            self.restore(resume_from)
         self.stop = False
-        num_cycles = 0
-        while num_cycles <= self.max_cycles and not self.stop:
-            await self.process_instruction()
-            num_cycles += 1
-        if num_cycles >= self.max_cycles:
-            raise RecursionError("Reached max cycles.")
-
-    async def process_instruction(self):
-        code_raw = self.read_and_skip()
-        code = Code(code_raw)
-        if code.op_code == 1:
-            self.process_sum(code)
-        elif code.op_code == 2:
-            self.process_mul(code)
-        elif code.op_code == 3:
-            await self.process_consume_input(code)
-        elif code.op_code == 4:
-            await self.process_write_output(code)
-        elif code.op_code == 5:
-            self.process_jump_if_true(code)
-        elif code.op_code == 6:
-            self.process_jump_if_false(code)
-        elif code.op_code == 7:
-            self.process_less_than(code)
-        elif code.op_code == 8:
-            self.process_equal(code)
-        elif code.op_code == 9:
-            self.process_adjust_relative_base(code)
-        elif code.op_code == 99:
-            self.stop = True
-        else:
-            raise ValueError(f"Unknown code {code.op_code}")
-
-    def process_less_than(self, code):
-        self.process_two_input_function(code, lambda a, b: int(operator.lt(a, b)))
-
-    def process_equal(self, code):
-        self.process_two_input_function(code, lambda a, b: int(operator.eq(a, b)))
-
-    def process_sum(self, code):
-        self.process_two_input_function(code, operator.add)
-
-    def process_mul(self, code):
-        self.process_two_input_function(code, operator.mul)
-
-    def process_jump_if_true(self, code):
-        first, second = self.read_n_parameter_values(code, 2)
-        if first != 0:
-            self.position = second
-
-    def process_jump_if_false(self, code):
-        first, second = self.read_n_parameter_values(code, 2)
-        if first == 0:
-            self.position = second
-
-    async def process_consume_input(self, code):
-        # print("Waiting for input...")
-        value_to_set = await self.input_queue.get()
-        # print(f'{self.name}: consuming input {value_to_consume}')
-        output_mode = code.get_n_mode(0)
-        self.set_memory_based_on_mode(output_mode, value_to_set)
-
-    def set_memory_based_on_mode(self, output_mode, value_to_set):
-        if output_mode is Modes.POSITION:
-            self.memory[self.read_and_skip()] = value_to_set
-        elif output_mode is Modes.RELATIVE:
-            self.memory[self.read_and_skip() + self.relative_base] = value_to_set
-
-    async def process_write_output(self, code):
-        value = self.read_n_parameter_values(code, 1)[0]
-        # print(f'{self.name}: output: {value}')
-        self.last_output = value
-        await self.output_queue.put(value)
-
-    def process_adjust_relative_base(self, code):
-        value = self.read_n_parameter_values(code, 1)[0]
-        self.relative_base += value
-
-    def process_two_input_function(self, code, f: callable):
-        params = self.read_n_parameter_values(code, 2)
-        value_to_set = f(*params)
-        output_mode = code.get_n_mode(2)
-        self.set_memory_based_on_mode(output_mode, value_to_set)
-
-    def read_n_parameter_values(self, code: Code, number_of_parameter_values_to_get: int):
-        values = []
-        for n in range(number_of_parameter_values_to_get):
-            mode_n = code.get_n_mode(n)
-            if mode_n is Modes.POSITION:
-                values.append(self.memory[self.read_and_skip()])
-            elif mode_n is Modes.IMMEDIATE:
-                values.append(self.read_and_skip())
-            elif mode_n is Modes.RELATIVE:
-                values.append(self.memory[self.read_and_skip() + self.relative_base])
+        self.reset_cycles()
+        while True:
+            status = self.run()
+            if status is Status.OUTPUT:
+                with self.waiting_for_io():
+                    await self.output_queue.put(self.last_output)
+            elif status is Status.NEEDS_INPUT:
+                with self.waiting_for_io():
+                    value = await self.input_queue.get()
+                self.provide_input(value)
             else:
-                raise ValueError(f'Unknown mode {mode_n}')
+                self.stop = True
+                return
+
+    def fork(self):
+        twin = super().fork()
+        twin.input_queue = self.copy_queue(self.input_queue)
+        twin.output_queue = self.copy_queue(self.output_queue)
+        return twin
+
+    def checkpoint(self):
+        checkpoint = super().checkpoint()
+        checkpoint.queues = {"input": self.queue_values(self.input_queue), "output": self.queue_values(self.output_queue)}
+        return checkpoint
+
+    def restore(self, checkpoint: Checkpoint):
+        super().restore(checkpoint)
+        self.input_queue = queues.Queue()
+        self.output_queue = queues.Queue()
+        for value in checkpoint.queues.get("input", ()):
+            self.input_queue.put_nowait(value)
+        for value in checkpoint.queues.get("output", ()):
+            self.output_queue.put_nowait(value)
+
+    @staticmethod
+    def queue_values(original: queues.Queue):
+        values = [original.get_nowait() for _ in range(original.qsize())]
+        for value in values:
+            original.put_nowait(value)
         return values
 
+    @classmethod
+    def copy_queue(cls, original: queues.Queue):
+        copied = queues.Queue()
+        for value in cls.queue_values(original):
+            copied.put_nowait(value)
+        return copied
+
 
 def part_1(inp):
     p1 = asyncio.run(main_event_loop(inp, start_value=1))
     return p1
 
 
-async def main_event_loop(inp, start_value=None):
-    comp = IntcodeComputer(inp)
+async def main_event_loop(inp, start_value=None, memory_backend="list", jit=False):
+    comp = IntcodeComputer(inp, memory_backend=memory_backend, jit=jit)
     if start_value is not None:
         await comp.input_queue.put(start_value)
     await comp.execute()
@@ -209,10 +131,61 @@ def test_sample_3(self):
     print('Sample 3 done')
 
 
+def test_memory_backends(self):
+    # writes just past the end, far past the end, and reads back through relative mode
+    inp = [1101, 3, 4, 20, 1101, 5, 6, 1000000, 109, 1000000, 204, 0, 4, 20, 4, 21, 99]
+    for memory_backend in ("list", "dict"):
+        self.assertEqual([11, 7, 0], asyncio.run(main_event_loop(inp, memory_backend=memory_backend)))
+    print('Memory backends done')
+
+
+def test_self_modifying_code(self):
+    # the second instruction overwrites the first one with a halt before jumping back to it
+    inp = [104, 7, 1101, 0, 99, 0, 1105, 1, 0]
+    self.assertEqual([7], part_1(inp))
+    print('Self modifying code done')
+
+
+def test_jit(self):
+    programs = [
+        [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99],
+        [1102, 34915192, 34915192, 7, 4, 7, 99, 0],
+        [104, 7, 1101, 0, 99, 0, 1105, 1, 0],
+        # the first instruction rewrites a parameter of the second one, inside the same block
+        [1101, 40, 2, 6, 1101, 0, 7, 20, 4, 20, 99],
+        # count down from the input to 0
+        [3, 100, 1001, 100, -1, 100, 1005, 100, 2, 4, 100, 99],
+    ]
+    for inp in programs:
+        expected = asyncio.run(main_event_loop(inp, start_value=1000))
+        self.assertEqual(expected, asyncio.run(main_event_loop(inp, start_value=1000, jit=True)))
+    self.assertEqual([42], asyncio.run(main_event_loop(programs[3], jit=True)))
+    print('JIT done')
+
+
+def test_checkpoint(self):
+    # count down from the input to 0
+    inp = [3, 100, 1001, 100, -1, 100, 1005, 100, 2, 4, 100, 99]
+    comp = IntcodeComputer(inp)
+    comp.max_cycles = 1000
+    comp.input_queue.put_nowait(5000)
+    self.assertRaises(RecursionError, asyncio.run, comp.execute())
+    checkpoint = comp.checkpoint()
+    comp.max_cycles = 100000
+    asyncio.run(comp.execute(resume_from=checkpoint))
+    self.assertEqual(0, comp.output_queue.get_nowait())
+    self.assertEqual(2 + 2 * 5000 + 1, comp.total_cycles())
+    print('Checkpoint done')
+
+
 if __name__ == "__main__":
     print('*** solving tests ***')
     test_sample_1(TestCase())
     test_sample_2(TestCase())
     test_sample_3(TestCase())
+    test_memory_backends(TestCase())
+    test_self_modifying_code(TestCase())
+    test_jit(TestCase())
+    test_checkpoint(TestCase())
     print('*** solving main ***')
     main("input")
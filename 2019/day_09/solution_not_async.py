@@ -1,157 +1,70 @@
-import operator
 import queue
-from collections import defaultdict
-from enum import Enum
 from unittest import TestCase
 
+from day_09.checkpoint import Checkpoint
+from day_09.intcode import IntcodeCore, Status
+from day_09.transcript import EventKind, ReplayComputer, ReplayDivergedError, Transcript
 
-class Modes(Enum):
-    POSITION = 0
-    IMMEDIATE = 1
-    RELATIVE = 2
 
+class IntcodeComputer(IntcodeCore):
+    """Front end pausing when it runs out of input, fed through `queue.Queue` objects."""
 
-class Code:
-
-    def __init__(self, code_raw: int):
-        self.op_code = code_raw % 100
-        modes_str = str(code_raw // 100)[::-1]
-        self.modes = {n: Modes(int(mode_str)) for n, mode_str in enumerate(modes_str)}
-
-    def get_n_mode(self, n: int):
-        return self.modes.get(n, Modes.POSITION)
-
-
-class IntcodeComputer:
-
-    def __init__(self, memory, name=None):
-        self.memory = self.memory_as_dict(memory)
-        self.position = 0
-        self.max_cycles = 1000000
+    def __init__(self, memory, name=None, memory_backend="list", jit=False, profile=False, record=False,
+                 fuse=False):
+        super().__init__(
+            memory, name=name, memory_backend=memory_backend, jit=jit, profile=profile, record=record, fuse=fuse
+        )
         self.stop = False
         self.input_queue = queue.Queue()
         self.output_queue = queue.Queue()
-        self.last_output = None
-        self.name = name or ''
-        self.relative_base = 0
         self.paused = False
 
-    @staticmethod
-    def memory_as_dict(memory):
-        dict_memory = defaultdict(int)
-        for k, v in enumerate(memory):
-            dict_memory[k] = v
-        return dict_memory
-
-    def read_and_skip(self):
-        value = self.memory[self.position]
-        self.position += 1
-        return value
-
-    def execute(self):
+    def execute(self, resume_from: Checkpoint = None):
+        if resume_from is not None:
+            self.restore(resume_from)
         self.stop = False
         self.paused = False
-        num_cycles = 0
-        while num_cycles <= self.max_cycles and not self.stop:
-            self.process_instruction()
-            num_cycles += 1
-        if num_cycles >= self.max_cycles:
-            raise RecursionError("Reached max cycles.")
-
-    def process_instruction(self):
-        code_raw = self.read_and_skip()
-        code = Code(code_raw)
-        if code.op_code == 1:
-            self.process_sum(code)
-        elif code.op_code == 2:
-            self.process_mul(code)
-        elif code.op_code == 3:
-            self.process_consume_input(code)
-        elif code.op_code == 4:
-            self.process_write_output(code)
-        elif code.op_code == 5:
-            self.process_jump_if_true(code)
-        elif code.op_code == 6:
-            self.process_jump_if_false(code)
-        elif code.op_code == 7:
-            self.process_less_than(code)
-        elif code.op_code == 8:
-            self.process_equal(code)
-        elif code.op_code == 9:
-            self.process_adjust_relative_base(code)
-        elif code.op_code == 99:
-            self.stop = True
-        else:
-            raise ValueError(f"Unknown code {code.op_code}")
-
-    def process_less_than(self, code):
-        self.process_two_input_function(code, lambda a, b: int(operator.lt(a, b)))
-
-    def process_equal(self, code):
-        self.process_two_input_function(code, lambda a, b: int(operator.eq(a, b)))
-
-    def process_sum(self, code):
-        self.process_two_input_function(code, operator.add)
-
-    def process_mul(self, code):
-        self.process_two_input_function(code, operator.mul)
-
-    def process_jump_if_true(self, code):
-        first, second = self.read_n_parameter_values(code, 2)
-        if first != 0:
-            self.position = second
-
-    def process_jump_if_false(self, code):
-        first, second = self.read_n_parameter_values(code, 2)
-        if first == 0:
-            self.position = second
-
-    def process_consume_input(self, code):
-        if self.input_queue.empty():
-            self.stop = True
-            self.paused = True
-            self.position -= 1
-            return
-        value_to_set = self.input_queue.get()
-        # print(f'{self.name}: consuming input {value_to_consume}')
-        output_mode = code.get_n_mode(0)
-        self.set_memory_based_on_mode(output_mode, value_to_set)
-
-    def set_memory_based_on_mode(self, output_mode, value_to_set):
-        if output_mode is Modes.POSITION:
-            self.memory[self.read_and_skip()] = value_to_set
-        elif output_mode is Modes.RELATIVE:
-            self.memory[self.read_and_skip() + self.relative_base] = value_to_set
-
-    def process_write_output(self, code):
-        value = self.read_n_parameter_values(code, 1)[0]
-        # print(f'{self.name}: output: {value}')
-        self.last_output = value
-        self.output_queue.put(value)
-
-    def process_adjust_relative_base(self, code):
-        value = self.read_n_parameter_values(code, 1)[0]
-        self.relative_base += value
-
-    def process_two_input_function(self, code, f: callable):
-        params = self.read_n_parameter_values(code, 2)
-        value_to_set = f(*params)
-        output_mode = code.get_n_mode(2)
-        self.set_memory_based_on_mode(output_mode, value_to_set)
-
-    def read_n_parameter_values(self, code: Code, number_of_parameter_values_to_get: int):
-        values = []
-        for n in range(number_of_parameter_values_to_get):
-            mode_n = code.get_n_mode(n)
-            if mode_n is Modes.POSITION:
-                values.append(self.memory[self.read_and_skip()])
-            elif mode_n is Modes.IMMEDIATE:
-                values.append(self.read_and_skip())
-            elif mode_n is Modes.RELATIVE:
-                values.append(self.memory[self.read_and_skip() + self.relative_base])
+        self.reset_cycles()
+        while True:
+            status = self.run()
+            if status is Status.OUTPUT:
+                self.output_queue.put(self.last_output)
+            elif status is Status.NEEDS_INPUT:
+                if self.input_queue.empty():
+                    self.stop = True
+                    self.paused = True
+                    return
+                self.provide_input(self.input_queue.get())
             else:
-                raise ValueError(f'Unknown mode {mode_n}')
-        return values
+                self.stop = True
+                return
+
+    def fork(self):
+        twin = super().fork()
+        twin.input_queue = self.copy_queue(self.input_queue)
+        twin.output_queue = self.copy_queue(self.output_queue)
+        return twin
+
+    def checkpoint(self):
+        checkpoint = super().checkpoint()
+        checkpoint.queues = {"input": list(self.input_queue.queue), "output": list(self.output_queue.queue)}
+        return checkpoint
+
+    def restore(self, checkpoint: Checkpoint):
+        super().restore(checkpoint)
+        self.input_queue = queue.Queue()
+        self.output_queue = queue.Queue()
+        for value in checkpoint.queues.get("input", ()):
+            self.input_queue.put(value)
+        for value in checkpoint.queues.get("output", ()):
+            self.output_queue.put(value)
+
+    @staticmethod
+    def copy_queue(original: queue.Queue):
+        copied = queue.Queue()
+        for value in list(original.queue):
+            copied.put(value)
+        return copied
 
     def get_outputs_as_list(self):
         outputs = []
@@ -162,13 +75,14 @@ class IntcodeComputer:
     def execution_ended(self):
         return self.stop and not self.paused
 
+
 def part_1(inp):
     p1 = main_event_loop(inp, start_value=1)
     return p1
 
 
-def main_event_loop(inp, start_value=None):
-    comp = IntcodeComputer(inp)
+def main_event_loop(inp, start_value=None, memory_backend="list", jit=False, fuse=False):
+    comp = IntcodeComputer(inp, memory_backend=memory_backend, jit=jit, fuse=fuse)
     if start_value is not None:
         comp.input_queue.put(start_value)
     comp.execute()
@@ -222,10 +136,312 @@ def test_sample_3(self):
     print('Sample 3 done')
 
 
+def test_memory_backends(self):
+    # writes just past the end, far past the end, and reads back through relative mode
+    inp = [1101, 3, 4, 20, 1101, 5, 6, 1000000, 109, 1000000, 204, 0, 4, 20, 4, 21, 99]
+    for memory_backend in ("list", "dict"):
+        self.assertEqual([11, 7, 0], main_event_loop(inp, memory_backend=memory_backend))
+    # negative addresses are reported, instead of wrapping around to the end of the list
+    programs = [
+        [4, -1, 99],  # read in position mode
+        [109, -5, 204, 1, 99],  # read in relative mode
+        [1101, 1, 2, -3, 99],  # write
+        [1105, 1, -2, 99],  # jump
+    ]
+    for inp in programs:
+        for memory_backend, jit in (("list", False), ("list", True), ("dict", False)):
+            with self.assertRaises(IndexError):
+                IntcodeComputer(inp, memory_backend=memory_backend, jit=jit).execute()
+    print('Memory backends done')
+
+
+def test_self_modifying_code(self):
+    # the second instruction overwrites the first one with a halt before jumping back to it
+    inp = [104, 7, 1101, 0, 99, 0, 1105, 1, 0]
+    self.assertEqual([7], part_1(inp))
+    print('Self modifying code done')
+
+
+def test_run_until_blocked(self):
+    # echo two inputs
+    comp = IntcodeComputer([3, 9, 4, 9, 3, 9, 4, 9, 99, 0])
+    self.assertIs(Status.NEEDS_INPUT, comp.run())
+    comp.provide_input(5)
+    self.assertIs(Status.OUTPUT, comp.run())
+    self.assertEqual(5, comp.last_output)
+    self.assertIs(Status.NEEDS_INPUT, comp.run())
+    comp.provide_input(6)
+    self.assertIs(Status.OUTPUT, comp.run())
+    self.assertEqual(6, comp.last_output)
+    self.assertIs(Status.HALTED, comp.run())
+    self.assertIs(Status.HALTED, comp.run())
+    print('Run until blocked done')
+
+
+def test_fork(self):
+    # add one to each input, forever
+    inp = [3, 11, 1001, 11, 1, 11, 4, 11, 1105, 1, 0, 0]
+    for jit in (False, True):
+        comp = IntcodeComputer(inp, jit=jit)
+        comp.input_queue.put(1)
+        comp.execute()
+        self.assertEqual([2], comp.get_outputs_as_list())
+        twin = comp.fork()
+        self.assertIs(comp.memory, twin.memory)
+        twin.input_queue.put(20)
+        twin.execute()
+        comp.input_queue.put(10)
+        comp.execute()
+        self.assertEqual([11], comp.get_outputs_as_list())
+        self.assertEqual([21], twin.get_outputs_as_list())
+        self.assertEqual((11, 21), (comp.memory[11], twin.memory[11]))
+    # a profiled computer and its fork count their own instructions
+    comp = IntcodeComputer(inp, profile=True)
+    comp.input_queue.put(1)
+    comp.execute()
+    instructions = comp.profile.instructions
+    twin = comp.fork()
+    self.assertIsNot(comp.profile, twin.profile)
+    twin.input_queue.put(20)
+    twin.execute()
+    self.assertEqual(instructions, comp.profile.instructions)
+    self.assertEqual(instructions, twin.profile.instructions)
+    print('Fork done')
+
+
+def test_batched(self):
+    from day_09.batched import BatchedIntcode
+
+    programs = [
+        [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99],
+        [1102, 34915192, 34915192, 7, 4, 7, 99, 0],
+        [104, 1125899906842624, 99],
+        [104, 7, 1101, 0, 99, 0, 1105, 1, 0],
+        [3, 100, 1001, 100, -1, 100, 1005, 100, 2, 4, 100, 99],
+    ]
+    for inp in programs:
+        # every instance counts down from a different input, so they diverge
+        batch = BatchedIntcode(inp, 3)
+        for instance in range(3):
+            batch.provide_input(instance, 10 * (instance + 1))
+        batch.run()
+        self.assertTrue(batch.halted.all())
+        for instance in range(3):
+            self.assertEqual(main_event_loop(inp, start_value=10 * (instance + 1)), batch.outputs[instance])
+    # negative addresses raise, like in IntcodeCore, unless the operand is immediate or unused
+    for inp in [
+        [4, -1, 99],
+        [109, -5, 204, 1, 99],
+        [1101, 1, 2, -3, 99],
+        [1105, 1, -2, 99],
+    ]:
+        with self.assertRaises(IndexError):
+            BatchedIntcode(inp, 2).run()
+    # with input 0, output -1 in immediate mode, otherwise output the cell at `address`,
+    # so the two instances run different instructions in the same step
+    def diverging(address):
+        batch = BatchedIntcode([3, 12, 1005, 12, 8, 104, -1, 99, 4, address, 99, 0, 0], 2)
+        batch.provide_input(0, 0)
+        batch.provide_input(1, 1)
+        batch.run()
+        return batch.outputs
+
+    self.assertEqual([[-1], [0]], diverging(11))
+    with self.assertRaises(IndexError):
+        diverging(-1)
+    print('Batched done')
+
+
+def test_profile(self):
+    # count down from 10: one input, 10 times (add, jump), one output and a halt
+    inp = [3, 100, 1001, 100, -1, 100, 1005, 100, 2, 4, 100, 99]
+    for jit in (False, True):
+        comp = IntcodeComputer(inp, jit=jit, profile=True)
+        comp.input_queue.put(10)
+        comp.execute()
+        profile = comp.profile.as_dict()
+        self.assertEqual(23, profile["instructions"])
+        self.assertEqual({"1": 10, "3": 1, "4": 1, "5": 10, "99": 1}, profile["op_code_counts"])
+        self.assertEqual([(2, 10), (6, 10)], profile["hot_positions"][:2])
+        self.assertIn('"instructions": 23', comp.profile.to_json())
+    print('Profile done')
+
+
+def test_jit(self):
+    programs = [
+        [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99],
+        [1102, 34915192, 34915192, 7, 4, 7, 99, 0],
+        [104, 7, 1101, 0, 99, 0, 1105, 1, 0],
+        # the first instruction rewrites a parameter of the second one, inside the same block
+        [1101, 40, 2, 6, 1101, 0, 7, 20, 4, 20, 99],
+        # count down from the input to 0
+        [3, 100, 1001, 100, -1, 100, 1005, 100, 2, 4, 100, 99],
+    ]
+    for inp in programs:
+        expected = main_event_loop(inp, start_value=1000)
+        self.assertEqual(expected, main_event_loop(inp, start_value=1000, jit=True))
+    self.assertEqual([42], main_event_loop(programs[3], jit=True))
+    print('JIT done')
+
+
+def test_fusion(self):
+    programs = [
+        [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99],
+        [104, 7, 1101, 0, 99, 0, 1105, 1, 0],
+        # count down from the input to 0, comparing and jumping on a relative cell
+        [109, 50, 3, 100, 1001, 100, -1, 100, 21007, 100, 1, 0, 1206, 0, 4, 4, 100, 99],
+        # the comparison turns the jump of its own pair into an addition
+        [1107, 1, 2, 4, 1005, 4, 11, 13, 104, 5, 4, 13, 99, 0],
+        # the jump's parameter is rewritten, so the pair stops testing the compared cell
+        [3, 100, 1001, 100, -1, 100, 1007, 100, 1, 101, 1101, 0, 100, 15, 1006, 101, 4, 4, 100, 99],
+    ]
+    for inp in programs:
+        expected = main_event_loop(inp, start_value=10)
+        for memory_backend in ("list", "dict"):
+            for jit in (False, True) if memory_backend == "list" else (False,):
+                comp = IntcodeComputer(inp, memory_backend=memory_backend, jit=jit, fuse=True)
+                comp.input_queue.put(10)
+                comp.execute()
+                self.assertEqual(expected, comp.get_outputs_as_list())
+    comp = IntcodeComputer(programs[2], fuse=True)
+    comp.input_queue.put(10)
+    comp.execute()
+    reference = IntcodeComputer(programs[2])
+    reference.input_queue.put(10)
+    reference.execute()
+    self.assertEqual(reference.total_cycles(), comp.total_cycles())
+    self.assertIn(8, comp.fused_cells[13])
+    print('Fusion done')
+
+
+def test_checkpoint(self):
+    # count down from the input to 0, 2 instructions per step
+    inp = [3, 100, 1001, 100, -1, 100, 1005, 100, 2, 4, 100, 99]
+    comp = IntcodeComputer(inp, jit=True)
+    comp.max_cycles = 1000
+    comp.checkpoint_every = 300
+    saved = []
+    comp.on_checkpoint = saved.append
+    comp.input_queue.put(5000)
+    comp.output_queue.put(-1)
+    self.assertRaises(RecursionError, comp.execute)
+    self.assertEqual(4, len(saved))
+    self.assertIs(saved[-1], comp.last_checkpoint)
+    self.assertGreater(comp.last_checkpoint.total_cycles, 1000)
+    for checkpoint in (saved[0], comp.last_checkpoint):
+        for memory_backend in ("list", "dict"):
+            resumed = IntcodeComputer([99], memory_backend=memory_backend)
+            resumed.max_cycles = 100000
+            resumed.execute(resume_from=Checkpoint.from_json(checkpoint.to_json()))
+            self.assertEqual([-1, 0], resumed.get_outputs_as_list())
+            self.assertEqual(2 + 2 * 5000 + 1, resumed.total_cycles())
+    # far writes live in the sparse part of the list memory
+    comp = IntcodeComputer([1101, 3, 4, 1000000, 3, 0, 4, 1000000, 99])
+    comp.execute()
+    self.assertTrue(comp.paused)
+    checkpoint = Checkpoint.from_json(comp.checkpoint().to_json())
+    self.assertEqual([(1000000, 7)], checkpoint.sparse_memory)
+    checkpoint.queues["input"].append(1)
+    resumed = IntcodeComputer([99])
+    resumed.execute(resume_from=checkpoint)
+    self.assertEqual([7], resumed.get_outputs_as_list())
+    print('Checkpoint done')
+
+
+def test_disassembler(self):
+    from day_09.disassembler import analyse
+
+    # count down from the input to 0
+    analysis = analyse([3, 100, 1001, 100, -1, 100, 1005, 100, 2, 4, 100, 99])
+    self.assertEqual([0, 2, 9], sorted(analysis.blocks))
+    self.assertEqual([2, 9], analysis.blocks[2].successors)
+    self.assertEqual(set(), analysis.data_cells())
+    self.assertEqual([0, 2, 9], analysis.stable_blocks())
+    # the second instruction overwrites the first one with a halt before jumping back to it
+    analysis = analyse([104, 7, 1101, 0, 99, 0, 1105, 1, 0])
+    self.assertEqual([(2, 0)], analysis.self_modifying_writes)
+    self.assertEqual([], analysis.stable_blocks())
+    # call a subroutine at 11 that outputs its argument, returning to 9 through the stack
+    program = [109, 20, 21101, 9, 0, 0, 1105, 1, 11, 99, 0, 204, 1, 2105, 1, 0, 99]
+    analysis = analyse(program)
+    self.assertEqual([13], analysis.computed_jumps)
+    self.assertEqual([2], analysis.relative_writes)
+    self.assertIn(9, analysis.blocks)
+    # the halt after the return is never reached
+    self.assertEqual({10, 16}, analysis.data_cells())
+    self.assertEqual([], analysis.invalid)
+    print('Disassembler done')
+
+
+def test_disassembler_unconditional_jumps(self):
+    from day_09.disassembler import analyse
+
+    # jump over the data cell 3, then add two constants into it and output it
+    analysis = analyse([1105, 1, 4, 1, 1101, 2, 3, 3, 4, 3, 99])
+    self.assertEqual([0, 4], sorted(analysis.blocks))
+    self.assertEqual([4], analysis.blocks[0].successors)
+    self.assertEqual({3}, analysis.data_cells())
+    self.assertEqual([], analysis.self_modifying_writes)
+    self.assertEqual([], analysis.invalid)
+    self.assertEqual([0, 4], analysis.stable_blocks())
+    # the same with a jump if zero on an immediate 0
+    analysis = analyse([1106, 0, 4, 0, 104, 7, 99])
+    self.assertEqual([0, 4], sorted(analysis.blocks))
+    self.assertEqual([4], analysis.blocks[0].successors)
+    self.assertEqual({3}, analysis.data_cells())
+    self.assertEqual([], analysis.invalid)
+    print('Disassembler unconditional jumps done')
+
+
+def test_transcript(self):
+    # add one to each input, forever
+    inp = [3, 11, 1001, 11, 1, 11, 4, 11, 1105, 1, 0, 0]
+    comp = IntcodeComputer(inp, record=True)
+    for value in (1, -300, 2 ** 60):
+        comp.input_queue.put(value)
+        comp.execute()
+    self.assertEqual([2, -299, 2 ** 60 + 1], comp.get_outputs_as_list())
+    self.assertEqual([(EventKind.INPUT, 1, 1), (EventKind.OUTPUT, 2, 2)], comp.transcript.events[:2])
+    # the computer has jumped back to the input since the last output
+    self.assertEqual(comp.total_cycles() - 1, comp.transcript.total_cycles())
+    transcript = Transcript.from_bytes(comp.transcript.to_bytes())
+    self.assertEqual(comp.transcript.events, transcript.events)
+    replay = ReplayComputer(transcript)
+    for value in (1, -300):
+        replay.input_queue.put(value)
+        replay.execute()
+        self.assertFalse(replay.execution_ended())
+    self.assertEqual([2, -299], replay.get_outputs_as_list())
+    replay.input_queue.put(5)
+    self.assertRaises(ReplayDivergedError, replay.execute)
+    # a halt is recorded once, however many times the halted computer runs
+    comp = IntcodeComputer([104, 7, 99], record=True)
+    comp.execute()
+    comp.execute()
+    replay = ReplayComputer(comp.transcript)
+    replay.execute()
+    self.assertTrue(replay.execution_ended())
+    self.assertEqual([7], replay.get_outputs_as_list())
+    self.assertEqual(2, replay.num_cycles)
+    print('Transcript done')
+
+
 if __name__ == "__main__":
     print('*** solving tests ***')
     test_sample_1(TestCase())
     test_sample_2(TestCase())
     test_sample_3(TestCase())
+    test_memory_backends(TestCase())
+    test_self_modifying_code(TestCase())
+    test_run_until_blocked(TestCase())
+    test_fork(TestCase())
+    test_batched(TestCase())
+    test_profile(TestCase())
+    test_jit(TestCase())
+    test_fusion(TestCase())
+    test_checkpoint(TestCase())
+    test_disassembler(TestCase())
+    test_disassembler_unconditional_jumps(TestCase())
+    test_transcript(TestCase())
     print('*** solving main ***')
     main("input")
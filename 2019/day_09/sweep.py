@@ -0,0 +1,60 @@
+"""Spread an embarrassingly parallel sweep over one Intcode program across processes.
+
+The program is handed to each worker once, through the pool initializer,
+and every task only carries a chunk of configurations.
+"""
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Tuple, TypeVar
+
+Configuration = TypeVar("Configuration")
+Result = TypeVar("Result")
+
+_worker_program = None
+
+
+def _install_program(program):
+    global _worker_program
+    _worker_program = program
+
+
+def _evaluate_chunk(evaluate, configurations):
+    return [evaluate(_worker_program, configuration) for configuration in configurations]
+
+
+def chunked(iterable: Iterable, chunk_size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+
+def sweep(
+    program: List[int],
+    configurations: Iterable[Configuration],
+    evaluate: Callable[[List[int], Configuration], Result],
+    reducer: Callable[[Iterator[Tuple[Configuration, Result]]], object],
+    max_workers=None,
+    chunk_size=64,
+):
+    """Reduce `evaluate(program, configuration)` over all configurations, in worker processes.
+
+    `evaluate` has to be a module level function (it is pickled by reference),
+    and must not modify the program it is given, since a worker reuses it for
+    all of its tasks. `reducer` gets the (configuration, result) pairs in the
+    order of `configurations`; if it stops early the pending chunks are cancelled.
+    """
+    chunks = list(chunked(configurations, chunk_size))
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_install_program, initargs=(program,)
+    ) as executor:
+        futures = [executor.submit(_evaluate_chunk, evaluate, chunk) for chunk in chunks]
+
+        def results():
+            for chunk, future in zip(chunks, futures):
+                yield from zip(chunk, future.result())
+
+        try:
+            return reducer(results())
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,178 @@
+"""Record the I/O of an Intcode computer, and replay it without running the program.
+
+An IntcodeCore created with `record=True` appends an event to its
+`transcript` for every input it consumes, every output it produces and for
+halting, together with the number of instructions executed since the
+previous event. `to_bytes`/`save` write it in a compact binary form:
+
+    b"ICT1" event*
+
+where each event is two varints: `cycles << 2 | kind`, then the value
+zigzag encoded (0 for a halt), so small values and short gaps take a byte
+each.
+
+`ReplayComputer` plays a transcript back behind the same interface as
+`day_09.solution_not_async.IntcodeComputer`, so the logic consuming the
+outputs can be iterated on at I/O speed.
+"""
+import queue
+from enum import IntEnum
+from typing import Iterator, List, Tuple
+
+MAGIC = b"ICT1"
+
+
+class EventKind(IntEnum):
+    INPUT = 0
+    OUTPUT = 1
+    HALT = 2
+
+
+Event = Tuple[EventKind, int, int]
+
+
+class ReplayDivergedError(ValueError):
+    pass
+
+
+def write_varint(buffer: bytearray, value: int):
+    while value > 0x7F:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    return 2 * value if value >= 0 else -2 * value - 1
+
+
+def unzigzag(value: int) -> int:
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+class Transcript:
+    """The (kind, value, cycles) events of one run, cycles counted since the previous event."""
+
+    def __init__(self, events=None):
+        self.events: List[Event] = list(events or ())
+        self.last_event_cycles = 0
+
+    def record(self, kind: EventKind, value: int, total_cycles: int):
+        if kind is EventKind.HALT and self.events and self.events[-1][0] is EventKind.HALT:
+            # a halted computer halts again every time it runs
+            return
+        self.events.append((kind, value, total_cycles - self.last_event_cycles))
+        self.last_event_cycles = total_cycles
+
+    def copy(self):
+        transcript = Transcript(self.events)
+        transcript.last_event_cycles = self.last_event_cycles
+        return transcript
+
+    def inputs(self) -> List[int]:
+        return [value for kind, value, _ in self.events if kind is EventKind.INPUT]
+
+    def outputs(self) -> List[int]:
+        return [value for kind, value, _ in self.events if kind is EventKind.OUTPUT]
+
+    def total_cycles(self) -> int:
+        return sum(cycles for _, _, cycles in self.events)
+
+    def __iter__(self) -> Iterator[Event]:
+        return iter(self.events)
+
+    def __len__(self):
+        return len(self.events)
+
+    def to_bytes(self) -> bytes:
+        buffer = bytearray(MAGIC)
+        for kind, value, cycles in self.events:
+            write_varint(buffer, cycles << 2 | kind)
+            write_varint(buffer, zigzag(value))
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Transcript":
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not an Intcode transcript")
+        events = []
+        offset = len(MAGIC)
+        while offset < len(data):
+            header, offset = read_varint(data, offset)
+            value, offset = read_varint(data, offset)
+            events.append((EventKind(header & 0b11), unzigzag(value), header >> 2))
+        return cls(events)
+
+    def save(self, filename):
+        with open(filename, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, filename) -> "Transcript":
+        with open(filename, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayComputer:
+    """Stand-in for `solution_not_async.IntcodeComputer` that replays a transcript.
+
+    Inputs are taken from `input_queue` where the recording consumed them,
+    and with `strict` they must match the recorded ones, otherwise the
+    outputs that follow would not be the ones the program produced.
+    `num_cycles` counts the instructions the recording executed, so
+    benchmarks can report what the replay saved.
+    """
+
+    def __init__(self, transcript: Transcript, strict=True):
+        self.events = list(transcript)
+        self.next_event = 0
+        self.strict = strict
+        self.input_queue = queue.Queue()
+        self.output_queue = queue.Queue()
+        self.num_cycles = 0
+        self.stop = False
+        self.paused = False
+
+    def execute(self):
+        self.stop = False
+        self.paused = False
+        while self.next_event < len(self.events):
+            kind, value, cycles = self.events[self.next_event]
+            if kind is EventKind.INPUT:
+                if self.input_queue.empty():
+                    self.stop = True
+                    self.paused = True
+                    return
+                given = self.input_queue.get()
+                if self.strict and given != value:
+                    raise ReplayDivergedError(
+                        f"Input {self.next_event} is {given}, the recording consumed {value}"
+                    )
+            elif kind is EventKind.OUTPUT:
+                self.output_queue.put(value)
+            self.num_cycles += cycles
+            self.next_event += 1
+            if kind is EventKind.HALT:
+                break
+        self.stop = True
+
+    def get_outputs_as_list(self):
+        outputs = []
+        while not self.output_queue.empty():
+            outputs.append(self.output_queue.get())
+        return outputs
+
+    def execution_ended(self):
+        return self.stop and not self.paused
@@ -1,8 +1,8 @@
-import dataclasses
-from collections import defaultdict
-from math import gcd, atan2, pi
+from math import gcd
 from unittest import TestCase
 
+import numpy as np
+
 
 def main(input_file):
     """Solve puzzle and connect part 1 with part 2 if needed."""
@@ -26,85 +26,81 @@ def read_input(filename="input"):
     return inp
 
 
-def get_direction(asteroid, station):
-    return get_direction_and_distance(asteroid, station)[0]
-
-
-def get_direction_and_distance(asteroid, station):
-    delta_x = asteroid[0] - station[0]
-    delta_y = asteroid[1] - station[1]
-    gcd_abs = abs(gcd(delta_x, delta_y))
-    return (delta_x // gcd_abs, delta_y // gcd_abs), delta_x * delta_x + delta_y * delta_y
-
-
-def count_visible_from_station(asteroids, station):
-    unique_directions = set()
-    for asteroid in asteroids:
-        if asteroid == station:
-            continue
-        unique_directions.add(get_direction(asteroid, station))
-    return len(unique_directions)
-
-
-@dataclasses.dataclass
-class Asteroid:
-    coords: tuple
-    direction: tuple
-    distance: int
-
-
-def order_asteroids_on_same_line_by_distance(detailed_asteroids):
-    for asteroid_direction, asteroids in detailed_asteroids.items():
-        if len(asteroids) > 1:
-            # put closest last so we can pop from the list
-            asteroids.sort(key=lambda x: x.distance, reverse=True)
-
-
-def get_angle_to_top(direction):
-    dx = direction[0]
-    dy = direction[1]
-    angle = pi / 4 - atan2(dx, dy)
-    return angle
+def get_asteroids(inp):
+    """Return the x and y coordinates of the asteroids, as two arrays."""
+    ys, xs = np.nonzero(np.array(inp, dtype=np.int8))
+    return xs, ys
+
+
+def get_direction_codes(xs, ys):
+    """Return a number for the direction from every asteroid to every other, one row per station.
+
+    Directions are reduced by their gcd, so the asteroids hiding each other
+    get the same number, and the station itself gets 0. The gcd is only
+    computed once per possible offset between two asteroids, every pair then
+    looks its direction up.
+    """
+    width, height = int(np.ptp(xs)), int(np.ptp(ys))
+    offsets_x = np.arange(-width, width + 1, dtype=np.int32)[:, np.newaxis]
+    offsets_y = np.arange(-height, height + 1, dtype=np.int32)[np.newaxis, :]
+    divisor = np.gcd(offsets_x, offsets_y)
+    divisor[width, height] = 1
+    span = 2 * height + 1
+    codes = ((offsets_x // divisor) * span + offsets_y // divisor).ravel()
+    # the offset (dx, dy) is at dx * span + dy in the flat table, shifted by its middle
+    keys = xs.astype(np.int32) * span + ys.astype(np.int32)
+    return codes[keys[np.newaxis, :] - keys[:, np.newaxis] + (width * span + height)]
+
+
+def count_visible(xs, ys):
+    """Return how many asteroids each asteroid detects, one per direction."""
+    directions = np.sort(get_direction_codes(xs, ys), axis=1)
+    distinct = np.count_nonzero(np.diff(directions, axis=1), axis=1) + 1
+    # the station itself is the 0 direction
+    return distinct - 1
+
+
+def get_vaporisation_order(xs, ys, station):
+    """Return the indices of the asteroids in the order the laser vaporises them.
+
+    The laser starts pointing up and rotates clockwise, y pointing down, and
+    on each turn only vaporises the closest asteroid left in each direction.
+    """
+    others = np.flatnonzero((xs != xs[station]) | (ys != ys[station]))
+    delta_x = xs[others] - xs[station]
+    delta_y = ys[others] - ys[station]
+    divisor = np.gcd(delta_x, delta_y)
+    # angles are computed from the reduced directions, so equal directions have equal angles
+    angle = np.arctan2(delta_x // divisor, -(delta_y // divisor)) % (2 * np.pi)
+    # the number of steps along the direction orders the asteroids in it
+    distance = divisor
+    by_angle = np.lexsort((distance, angle))
+    # the turn on which each asteroid goes is its rank among those in the same direction
+    sorted_angle = angle[by_angle]
+    new_direction = np.ones(len(others), dtype=bool)
+    new_direction[1:] = sorted_angle[1:] != sorted_angle[:-1]
+    group_start = np.maximum.accumulate(np.where(new_direction, np.arange(len(others)), 0))
+    turn = np.empty(len(others), dtype=np.int64)
+    turn[by_angle] = np.arange(len(others)) - group_start
+    return others[np.lexsort((angle, turn))]
 
 
 def part_1(inp):
     # part 1
-    asteroids = set()
-    for y, row in enumerate(inp):
-        for x, val in enumerate(row):
-            if val == 1:
-                asteroids.add((x, y))
-    visible = dict()
-    for station in asteroids:
-        visible[station] = count_visible_from_station(asteroids, station)
-    best_station = max(visible, key=visible.get)
-    number_detected = max(visible.values())
+    xs, ys = get_asteroids(inp)
+    visible = count_visible(xs, ys)
+    best = int(np.argmax(visible))
+    best_station = (int(xs[best]), int(ys[best]))
+    number_detected = int(visible[best])
     print(f'Best is {best_station} with {number_detected} other asteroids detected.')
     p1 = number_detected
 
     # part 2
-    detailed_asteroids = defaultdict(list)
-    for asteroid in asteroids:
-        if asteroid == best_station:
-            continue
-        direction, distance = get_direction_and_distance(asteroid, best_station)
-        a = Asteroid(coords=asteroid, direction=direction, distance=distance)
-        detailed_asteroids[get_angle_to_top(direction)].append(a)
-    order_asteroids_on_same_line_by_distance(detailed_asteroids)
-    detailed_asteroids = dict(sorted(detailed_asteroids.items()))
-    count = 0
-    still_some_left = True
-    while still_some_left:
-        still_some_left = False
-        for k, v in detailed_asteroids.items():
-            if not v:
-                continue
-            count += 1
-            asteroid_gone = v.pop()
-            # print(f'count {count}: {asteroid_gone}')
-            still_some_left = True
-            if count == 200:
-                p2 = asteroid_gone.coords[0] * 100 + asteroid_gone.coords[1]
+    p2 = None
+    order = get_vaporisation_order(xs, ys, best)
+    if len(order) >= 200:
+        asteroid_gone = order[199]
+        p2 = int(xs[asteroid_gone]) * 100 + int(ys[asteroid_gone])
 
     return p1, p2
 
@@ -123,9 +119,29 @@ def test_sample_2(self):
     self.assertEqual(33, part_1(inp)[0])
 
 
+def test_random_field(self):
+    random = np.random.default_rng(10)
+    inp = (random.random((40, 50)) < 0.3).astype(int).tolist()
+    xs, ys = get_asteroids(inp)
+    asteroids = list(zip(xs.tolist(), ys.tolist()))
+    expected = []
+    for station in asteroids:
+        directions = set()
+        for asteroid in asteroids:
+            if asteroid != station:
+                delta_x, delta_y = asteroid[0] - station[0], asteroid[1] - station[1]
+                divisor = gcd(delta_x, delta_y)
+                directions.add((delta_x // divisor, delta_y // divisor))
+        expected.append(len(directions))
+    self.assertEqual(expected, count_visible(xs, ys).tolist())
+    order = get_vaporisation_order(xs, ys, 0)
+    self.assertEqual(sorted(range(1, len(asteroids))), sorted(order.tolist()))
+
+
 if __name__ == "__main__":
     print('*** solving tests ***')
-    # test_sample_2(TestCase())
+    test_sample_2(TestCase())
     test_sample_1(TestCase())
+    test_random_field(TestCase())
     print('*** solving main ***')
     main("input")
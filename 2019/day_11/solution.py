@@ -108,12 +108,14 @@ class Robot:
         print(render)
 
 
-def part_n(inp, part_1=True):
+def part_n(inp, part_1=True, comp=None):
+    """Paint the hull; `comp` can be a recording IntcodeComputer or a ReplayComputer to reuse a run."""
     if part_1:
         starting_color = 0
     else:
         starting_color = 1
-    comp = IntcodeComputer(inp)
+    if comp is None:
+        comp = IntcodeComputer(inp)
     robot = Robot(comp, Coords(x=0, y=0), UP, starting_color=starting_color)
     while not robot.computer.execution_ended():
         color, turn = robot.get_color_and_turn(robot.get_color_at_current_position())
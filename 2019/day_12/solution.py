@@ -1,13 +1,9 @@
-import itertools
 from math import lcm
-from typing import List
 from unittest import TestCase
 
 import numpy as np
 from parse import parse
 
-Vector3D = np.ndarray
-
 
 def read_input(filename="input"):
     with open(filename) as f:
@@ -17,120 +13,85 @@ def read_input(filename="input"):
     return inp
 
 
-class Body:
-    def __init__(
-            self, initial_position: Vector3D, initial_velocity: Vector3D, name: str
-    ):
-        self.pos = initial_position
-        self.vel = initial_velocity
-        self.name = name
-
-    def __repr__(self):
-        return (
-            f"{self.name:>10}: pos=<x={self.pos[0]:>3}, y={self.pos[1]:>3}, z={self.pos[2]:>3}>, "
-            f"vel=<x={self.vel[0]:>3}, y={self.vel[1]:>3}, z={self.vel[2]:>3}>"
-        )
-
-    @property
-    def potential_energy(self):
-        return sum(abs(self.pos))
-
-    @property
-    def kinetic_energy(self):
-        return sum(abs(self.vel))
-
-    @property
-    def total_energy(self):
-        return self.potential_energy * self.kinetic_energy
+MOON_NAMES = ("Io", "Europa", "Ganymede", "Callisto")
 
 
 class System:
-    def __init__(self, bodies: List[Body]):
-        self.bodies = bodies
+    """Positions and velocities of the bodies, as (bodies x 3) arrays."""
+
+    def __init__(self, positions, velocities=None, names=MOON_NAMES):
+        self.positions = np.array(positions, dtype=np.int64)
+        if velocities is None:
+            velocities = np.zeros_like(self.positions)
+        self.velocities = np.array(velocities, dtype=np.int64)
+        self.names = names
         self.age = 0
-        self.previous_states = set(self.get_system_state())
-
-    def get_system_state(self):
-        state = tuple((tuple(body.pos), tuple(body.vel)) for body in self.bodies)
-        return state
+        # pairwise position differences, reused by every step
+        self._differences = np.empty((len(self.positions),) + self.positions.shape, dtype=np.int64)
 
     def __repr__(self):
         _repr = ""
-        for body in self.bodies:
-            _repr += f"{repr(body)}\n"
+        for name, pos, vel in zip(self.names, self.positions, self.velocities):
+            _repr += (
+                f"{name:>10}: pos=<x={pos[0]:>3}, y={pos[1]:>3}, z={pos[2]:>3}>, "
+                f"vel=<x={vel[0]:>3}, y={vel[1]:>3}, z={vel[2]:>3}>\n"
+            )
         return _repr
 
     def simulate(self, number_of_steps):
-        target_age = self.age + number_of_steps
-        for self.age in range(self.age, target_age + 1):
-            # print(f"Energy after {self.age} steps: {self.get_total_energy()}")
-            # print(self)
-            if self.age < target_age:
-                self.update_system()
-            state = self.get_system_state()
-            if state in self.previous_states:
-                print(f"Repeated state after {self.age} steps")
-                return
-            if self.age % 100000 == 0:
-                print(f"age is {self.age}")
-            self.previous_states.add(state)
+        for _ in range(number_of_steps):
+            self.update_system()
 
     def get_total_energy(self):
-        return sum(body.total_energy for body in self.bodies)
+        potential_energy = np.abs(self.positions).sum(axis=1)
+        kinetic_energy = np.abs(self.velocities).sum(axis=1)
+        return int(np.dot(potential_energy, kinetic_energy))
 
     def update_system(self):
         self.apply_gravity()
         self.apply_velocity()
+        self.age += 1
 
     def apply_gravity(self):
-        for body_a, body_b in itertools.combinations(self.bodies, 2):
-            for dimension in range(3):
-                if body_a.pos[dimension] > body_b.pos[dimension]:
-                    body_a.vel[dimension] -= 1
-                    body_b.vel[dimension] += 1
-                elif body_a.pos[dimension] < body_b.pos[dimension]:
-                    body_a.vel[dimension] += 1
-                    body_b.vel[dimension] -= 1
+        # each body is pulled by one unit towards every other body, on each axis
+        np.subtract(self.positions[np.newaxis, :, :], self.positions[:, np.newaxis, :], out=self._differences)
+        np.sign(self._differences, out=self._differences)
+        self.velocities += self._differences.sum(axis=1)
 
     def apply_velocity(self):
-        for body in self.bodies:
-            body.pos += body.vel
+        self.positions += self.velocities
+
+    def find_cycles(self):
+        """Return the number of steps after which each axis is back to its current state.
+
+        The axes are independent, and each step can be undone, so the first
+        state an axis repeats is the one it started from: only that state
+        is kept, and the three axes are simulated together.
+        """
+        initial_positions = self.positions.copy()
+        initial_velocities = self.velocities.copy()
+        cycles = [None, None, None]
+        start_age = self.age
+        while None in cycles:
+            self.update_system()
+            repeated = (self.velocities == initial_velocities).all(axis=0)
+            if not repeated.any():
+                continue
+            repeated &= (self.positions == initial_positions).all(axis=0)
+            for axis in np.flatnonzero(repeated):
+                if cycles[axis] is None:
+                    cycles[axis] = self.age - start_age
+        return cycles
 
 
 def part_1(inp, number_of_steps=1000):
-    return part_n(inp, number_of_steps=number_of_steps)
-
-
-def part_n(inp, number_of_steps=1000, is_part_1=True, dimension=None):
-    if dimension is None:
-        factor = np.array((1, 1, 1))
-    elif dimension == 0:
-        factor = np.array((1, 0, 0))
-    elif dimension == 1:
-        factor = np.array((0, 1, 0))
-    elif dimension == 2:
-        factor = np.array((0, 0, 1))
-    else:
-        raise ValueError()
-
-    moon_names = ("Io", "Europa", "Ganymede", "Callisto")
-    the_system = System(
-        [
-            Body(np.array(loc) * factor, np.array((0, 0, 0)), name)
-            for (loc, name) in zip(inp, moon_names)
-        ]
-    )
+    the_system = System(inp)
     the_system.simulate(number_of_steps)
-    if is_part_1:
-        return the_system.get_total_energy()
-    return the_system.age
+    return the_system.get_total_energy()
 
 
 def part_2(inp):
-    cycle_x = part_n(inp, number_of_steps=10000000000000, is_part_1=False, dimension=0)
-    cycle_y = part_n(inp, number_of_steps=10000000000000, is_part_1=False, dimension=1)
-    cycle_z = part_n(inp, number_of_steps=10000000000000, is_part_1=False, dimension=2)
-    return lcm(cycle_x, cycle_y, cycle_z)
+    return lcm(*System(inp).find_cycles())
 
 
 def test_sample_1(self):
@@ -142,6 +103,7 @@ def test_sample_1(self):
 def test_sample_2(self):
     inp = read_input("sample_2")
     self.assertEqual(1940, part_1(inp, number_of_steps=100))
+    self.assertEqual(4686774924, part_2(inp))
 
 
 def main(input_file):
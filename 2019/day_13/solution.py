@@ -1,9 +1,13 @@
 import asyncio
 import dataclasses
+import io
 from asyncio import Queue
 from enum import Enum
-from typing import Iterable, Tuple, Dict, List
+from typing import Iterable, Tuple, Dict, List, Optional
+from unittest import TestCase
 
+from aoc.grids import ChunkedGrid, StreamingASCIIRenderer
+from day_09.intcode import IntcodeCore, Status
 from day_09.solution import IntcodeComputer
 
 
@@ -108,17 +112,20 @@ class ScreenASCIIRender:
     }
     unknown_char = '?'
 
+    @classmethod
+    def streaming_renderer(cls, stream=None, frame_diff=False) -> StreamingASCIIRenderer:
+        chars = {tile_type.value: char for tile_type, char in cls.tile_chars.items()}
+        return StreamingASCIIRenderer(chars, cls.unknown_char, stream=stream, frame_diff=frame_diff)
+
     @classmethod
     def render(cls, game_state: GameState):
-        render: str = f"score: {game_state.score}\n"
         tiles_as_dict = game_state.screen_data.get_tiles_as_dict()
-        limits = game_state.screen_data.get_min_max_tile_coords(tiles_as_dict.keys())
-        for y in limits.y_range():
-            for x in limits.x_range():
-                tile = tiles_as_dict.get((x, y), None)
-                char = cls.tile_chars.get(tile.properties.tile_type, cls.unknown_char)
-                render += char
-            render += '\n'
+        screen = ChunkedGrid()
+        for coords, tile in tiles_as_dict.items():
+            screen[coords] = tile.properties.tile_type.value
+        stream = io.StringIO()
+        cls.streaming_renderer(stream).render(screen.to_array(), header=f"score: {game_state.score}")
+        render = stream.getvalue()
         print(render)
         return render
 
@@ -133,7 +140,7 @@ class ScreenASCIIRender:
 class Arcade:
 
     def __init__(self, computer_inp):
-        self.computer = IntcodeComputer(computer_inp)
+        self.computer = IntcodeComputer(computer_inp, jit=True)
         self.game_state = GameState()
 
     async def switch_on(self, is_part_2=True):
@@ -164,6 +171,77 @@ class Arcade:
                 self.game_state.screen_data.add_tile(Tile(x, y, tile_id))
 
 
+class HeadlessArcade:
+    """Arcade running the computer directly, without asyncio tasks, sleeps or a screen refresh loop.
+
+    The ball and paddle are tracked as their tiles arrive, and the joystick
+    position is only worked out when the game asks for it, so the game runs
+    at the speed of the computer. With `render`, the screen is drawn every
+    time the game waits for the joystick, rewriting only the rows that changed.
+    """
+
+    def __init__(self, computer_inp, render=False, stream=None):
+        self.computer = IntcodeCore(computer_inp, jit=True)
+        self.game_state = GameState()
+        self.render = render
+        # tile types by (x, y), y growing down the screen, kept only to render
+        self.screen = ChunkedGrid() if render else None
+        self.renderer = ScreenASCIIRender.streaming_renderer(stream, frame_diff=True) if render else None
+        self.ball_tile: Optional[Tile] = None
+        self.paddle_tile: Optional[Tile] = None
+
+    def switch_on(self, is_part_2=True):
+        if is_part_2:
+            # Bypass coin
+            self.computer.memory[0] = 2
+        output = []
+        while True:
+            status = self.computer.run()
+            if status is Status.OUTPUT:
+                output.append(self.computer.last_output)
+                if len(output) == 3:
+                    self.update_screen_data(*output)
+                    output.clear()
+            elif status is Status.NEEDS_INPUT:
+                if self.render:
+                    self.renderer.render(self.screen.to_array(), header=f"score: {self.game_state.score}")
+                self.computer.reset_cycles()
+                self.computer.provide_input(self.joystick_position())
+            else:
+                return
+
+    def update_screen_data(self, x, y, int_id):
+        if (x, y) == (-1, 0):
+            self.game_state.score = int_id
+            return
+        tile = Tile(x, y, int_id)
+        self.game_state.screen_data.add_tile(tile)
+        if self.screen is not None:
+            self.screen[(x, y)] = int_id
+        if tile.properties.tile_type is TilesType.BALL:
+            self.ball_tile = tile
+        elif tile.properties.tile_type is TilesType.PADDLE:
+            self.paddle_tile = tile
+
+    def joystick_position(self):
+        if self.ball_tile is None or self.paddle_tile is None:
+            return 0
+        return GamerAI.get_joystick_position(self.ball_tile, self.paddle_tile)
+
+
+def headless_part_1(inp, render=False):
+    arcade = HeadlessArcade(inp, render=render)
+    arcade.switch_on(is_part_2=False)
+    return sum(tile.properties.tile_type is TilesType.BLOCK for tile in
+               arcade.game_state.screen_data.get_tiles_as_dict().values())
+
+
+def headless_part_2(inp, render=False):
+    arcade = HeadlessArcade(inp, render=render)
+    arcade.switch_on(is_part_2=True)
+    return arcade.game_state.score
+
+
 async def main_loop_part_1(inp):
     arcade = Arcade(inp)
     await arcade.switch_on(is_part_2=False)
@@ -220,13 +298,32 @@ class GamerAI:
 
 
 def part_1(inp):
-    return asyncio.run(main_loop_part_1(inp))
+    return headless_part_1(inp)
 
 
 def part_2(inp):
-    return asyncio.run(main_loop_part_2(inp))
+    return headless_part_2(inp)
+
+
+def test_headless(self):
+    # a block and a wall, the ball at x=5 and the paddle at x=2, then the joystick position as score
+    inp = [104, 7, 104, 0, 104, 2, 104, 8, 104, 0, 104, 1, 104, 5, 104, 10, 104, 4, 104, 2, 104, 20, 104, 3,
+           3, 100, 104, -1, 104, 0, 4, 100, 99]
+    self.assertEqual(1, headless_part_1(inp))
+    arcade = HeadlessArcade(inp)
+    arcade.switch_on(is_part_2=False)
+    self.assertEqual(1, arcade.game_state.score)
+    self.assertEqual((5, 2), (arcade.ball_tile.location.x, arcade.paddle_tile.location.x))
+    self.assertEqual("score: 1\n?????▓█\n", ScreenASCIIRender.render(arcade.game_state)[:17])
+    stream = io.StringIO()
+    arcade = HeadlessArcade(inp, render=True, stream=stream)
+    arcade.switch_on(is_part_2=False)
+    self.assertIn("\x1b[12;1H???●???", stream.getvalue())
+    print('Headless done')
 
 
 if __name__ == "__main__":
+    print('*** solving tests ***')
+    test_headless(TestCase())
     print('*** solving main ***')
     main("input")
@@ -1,10 +1,6 @@
 import dataclasses
-import math
-from collections import defaultdict
 from typing import Dict
 from unittest import TestCase
-from scipy.optimize import fsolve
-import numpy as np
 
 
 def main(input_file):
@@ -78,29 +74,64 @@ class Reaction:
         return f"<Reaction: {self.inputs} => {self.outputs}>"
 
 
-def produce_n_fuel(all_reactions, n):
-    stock = defaultdict(int)
-    stock["FUEL"] -= n
-    negative_stock = get_elements_with_demand(stock)
-    while negative_stock != {"ORE"}:
-        for element in negative_stock:
-            if element == "ORE":
-                continue
-            desired_output_quantity = stock[element]
-            reaction = all_reactions[element]
-            results = reaction.calculate(-desired_output_quantity)
-            for (
-                actual_output_element,
-                actual_output_quantity,
-            ) in results.actual_outputs.items():
-                stock[actual_output_element] += actual_output_quantity
-            for (
-                actual_input_element,
-                actual_input_quantity,
-            ) in results.actual_inputs.items():
-                stock[actual_input_element] -= actual_input_quantity
-        negative_stock = get_elements_with_demand(stock)
-    return -stock["ORE"]
+class ReactionGraph:
+    """The reactions, with the chemicals sorted once so that ORE demand is a single pass.
+
+    A chemical comes after every chemical consuming it, so by the time it is
+    reached its whole demand is known, and the reaction producing it runs
+    just enough times, in one go.
+    """
+
+    def __init__(self, all_reactions: Dict[str, Reaction]):
+        self.order = self.sort_chemicals(all_reactions)
+        index = {element: n for n, element in enumerate(self.order)}
+        index["ORE"] = len(self.order)
+        self.output_quantities = [next(iter(all_reactions[element].outputs.values())) for element in self.order]
+        self.inputs = [
+            [(index[element], quantity) for element, quantity in all_reactions[element].inputs.items()]
+            for element in self.order
+        ]
+
+    @staticmethod
+    def sort_chemicals(all_reactions: Dict[str, Reaction]):
+        """Return the chemicals FUEL is made of, ORE excluded, each one before its inputs."""
+        order = []
+        visited = set()
+
+        def visit(element):
+            visited.add(element)
+            for input_element in all_reactions[element].inputs:
+                if input_element != "ORE" and input_element not in visited:
+                    visit(input_element)
+            order.append(element)
+
+        visit("FUEL")
+        return order[::-1]
+
+    def ore_needed(self, fuel: int) -> int:
+        demand = [0] * (len(self.order) + 1)
+        demand[0] = fuel
+        for n, output_quantity in enumerate(self.output_quantities):
+            number_of_times = -(-demand[n] // output_quantity)
+            for input_index, quantity in self.inputs[n]:
+                demand[input_index] += quantity * number_of_times
+        return demand[-1]
+
+    def max_fuel(self, ore: int) -> int:
+        """Return the most FUEL `ore` can make, galloping up to a bound, then searching below it."""
+        # leftovers are reused, so each FUEL needs at most as much as the first one
+        low = ore // self.ore_needed(1)
+        high = max(2 * low, 1)
+        while self.ore_needed(high) <= ore:
+            low, high = high, 2 * high
+        # ore_needed(low) <= ore < ore_needed(high)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.ore_needed(middle) <= ore:
+                low = middle
+            else:
+                high = middle
+        return low
 
 
 def part_1_and_2(inp, is_part_1=False):
@@ -108,28 +139,18 @@ def part_1_and_2(inp, is_part_1=False):
     for line in inp:
         reaction = Reaction(line)
         all_reactions[reaction.info_output_element()] = reaction
-    p1 = produce_n_fuel(all_reactions, 1)
+    graph = ReactionGraph(all_reactions)
+    p1 = graph.ore_needed(1)
     if is_part_1:
         return p1
 
     # part 2
-    target = 1000000000000
-    f = lambda x: produce_n_fuel(all_reactions, x) - target
-    solution = fsolve(f, np.array([target / p1]))
-    n_ceil = math.ceil(solution[0])
-    if produce_n_fuel(all_reactions, n_ceil) < target:
-        p2 = n_ceil
-    else:
-        n_floor = math.floor(solution[0])
-        p2 = n_floor
+    p2 = graph.max_fuel(1000000000000)
     return p1, p2
 
 
-def get_elements_with_demand(stock):
-    return {element for element, quantity in stock.items() if quantity < 0}
-
-
 def test_samples(self):
+    self.assertEqual(165, part_1_and_2(read_input("sample_1.txt"), is_part_1=True))
     expected = ((13312, 82892753), (180697, 5586022), (2210736, 460664))
     for n in range(2, 5):
         inp = read_input(f"sample_{n}.txt")
@@ -1,7 +1,8 @@
+import copy
+from collections import defaultdict, deque
 from enum import Enum
 from typing import Tuple, Iterable
-import networkx as nx
-import matplotlib.pyplot as plt
+from unittest import TestCase
 
 from aoc.grids import UnstructuredGrid
 from day_09.solution_not_async import IntcodeComputer
@@ -62,6 +63,12 @@ class RepairDroid:
         for direction in directions:
             self.move_and_get_feedback(direction)
 
+    def fork(self):
+        """Return a droid at the same position, whose computer is a fork of this one."""
+        twin = copy.copy(self)
+        twin.computer = self.computer.fork()
+        return twin
+
 
 class TileType(Enum):
     FREE = 0
@@ -80,13 +87,94 @@ def distance(a, b):
     return abs(b[0] - a[0]) + abs(b[1] - a[1])
 
 
+class DistanceField:
+    """Breadth first distances from `origin`, expanded one level at a time, only as far as queries need.
+
+    A settled cell has had its neighbours reached from it. Its distance is
+    final as long as no level below it is still waiting in `buckets`. Cells
+    discovered later are linked in with `add_cell`, and a cell whose
+    distance improves is unsettled and queued again, so only the levels the
+    new cell can shorten are revisited.
+    """
+
+    def __init__(self, origin, neighbours):
+        self.origin = origin
+        self.neighbours = neighbours
+        self.distance = {origin: 0}
+        self.parent = {origin: None}
+        self.settled = set()
+        # distance -> cells reached at that distance, not settled yet
+        self.buckets = defaultdict(list, {0: [origin]})
+        # the lowest distance that may still have cells to settle
+        self.level = 0
+
+    def reach(self, cell, via):
+        new_distance = self.distance[via] + 1
+        if new_distance < self.distance.get(cell, new_distance + 1):
+            self.distance[cell] = new_distance
+            self.parent[cell] = via
+            self.settled.discard(cell)
+            self.buckets[new_distance].append(cell)
+            self.level = min(self.level, new_distance)
+
+    def add_cell(self, cell):
+        for neighbour in self.neighbours(cell):
+            if neighbour in self.distance:
+                self.reach(cell, neighbour)
+
+    def is_settled(self, cell):
+        """Return whether the distance of `cell` is final."""
+        return cell in self.settled and (not self.buckets or self.distance[cell] < self.level)
+
+    def settle_next_level(self):
+        """Settle the cells at distance `level`, and return them."""
+        settled = []
+        for cell in self.buckets.pop(self.level, ()):
+            # cells queued again at a shorter distance, or twice at this one, are skipped
+            if self.distance[cell] == self.level and cell not in self.settled:
+                self.settled.add(cell)
+                settled.append(cell)
+        for cell in settled:
+            for neighbour in self.neighbours(cell):
+                self.reach(neighbour, cell)
+        self.level += 1
+        return settled
+
+    def expand_all(self):
+        while self.buckets:
+            self.settle_next_level()
+
+    def nearest(self, candidates):
+        """Return the candidate closest to the origin, or None when none can be reached."""
+        # a settled distance may still shrink, but then the cell is settled again below it, and replaces it
+        best = min(((self.distance[cell], cell) for cell in candidates if cell in self.settled), default=None)
+        while self.buckets and (best is None or best[0] >= self.level):
+            for cell in self.settle_next_level():
+                if cell in candidates:
+                    best = min(best or (self.distance[cell], cell), (self.distance[cell], cell))
+        return None if best is None else best[1]
+
+    def path_to(self, cell):
+        """Return the cells from the origin to `cell`, both included."""
+        while not self.is_settled(cell) and self.buckets:
+            self.settle_next_level()
+        if cell not in self.distance:
+            raise ValueError(f"No known path from {self.origin} to {cell}")
+        path = []
+        while cell is not None:
+            path.append(cell)
+            cell = self.parent[cell]
+        return path[::-1]
+
+
 class Map:
     def __init__(self):
         self.known_tiles = {(0, 0): TileType.FREE}
         self.path_to_non_blocked_known_tile = {(0, 0): []}
-        self.graph = nx.Graph()
-        self.graph.add_node((0, 0))
         self.grid = UnstructuredGrid(self.known_tiles)
+        # free cells next to at least one unknown cell
+        self.frontier = {(0, 0)}
+        self.field = None
 
     def show_as_ascii(self):
         ascii_str = self.grid.render_ascii(lambda x: ascii_mapping[x], "?")
@@ -96,12 +184,27 @@ class Map:
         self.grid.display_as_plot(lambda x: x.value, animate_pause=animate_pause)
 
     def add_tile(self, tile_coords, tile_type):
-        self.known_tiles[tile_coords] = tile_type
+        self.grid[tile_coords] = tile_type
+        for neighbour in self.get_neighbouring_tile_coords(tile_coords):
+            if neighbour in self.frontier and not self.cell_has_unknown_neighbours(neighbour):
+                self.frontier.discard(neighbour)
         if tile_type is not TileType.WALL:
-            self.graph.add_node(tile_coords)
-            for other_tile in self.get_neighbouring_tile_coords(tile_coords):
-                if other_tile in self.graph.nodes:
-                    self.graph.add_edge(other_tile, tile_coords)
+            if self.cell_has_unknown_neighbours(tile_coords):
+                self.frontier.add(tile_coords)
+            if self.field is not None:
+                self.field.add_cell(tile_coords)
+
+    def free_neighbours(self, cell):
+        for neighbour in self.get_neighbouring_tile_coords(cell):
+            tile_type = self.known_tiles.get(neighbour)
+            if tile_type is not None and tile_type is not TileType.WALL:
+                yield neighbour
+
+    def distance_field(self, origin) -> DistanceField:
+        """Return the distance field from `origin`, kept up to date while the origin does not change."""
+        if self.field is None or self.field.origin != origin:
+            self.field = DistanceField(origin, self.free_neighbours)
+        return self.field
 
     def all_tiles_have_known_neighbours(self):
         for tile_coords in self.known_tiles:
@@ -127,19 +230,8 @@ class Map:
             return (center[0] + 1, center[1])
 
     def get_next_tile_with_unknown_neighbours(self, current_position):
-        cells_to_explore = {
-            coords: distance(coords, current_position)
-            for coords, tile_type in self.known_tiles.items()
-            if tile_type is not TileType.WALL
-            and self.cell_has_unknown_neighbours(coords)
-        }
-        if not cells_to_explore:
-            return None
-        min_distance = min(cells_to_explore.values())
-        for cell, _distance in cells_to_explore.items():
-            if _distance == min_distance:
-                return cell
-        return None
+        """Return the closest (walking) free cell next to an unknown one, or None when all is mapped."""
+        return self.distance_field(current_position).nearest(self.frontier)
 
     def cell_has_unknown_neighbours(self, cell_coords):
         for neighbour in self.get_neighbouring_tile_coords(cell_coords):
@@ -148,7 +240,15 @@ class Map:
         return False
 
     def display_graph(self):
-        nx.draw(self.graph)
+        import matplotlib.pyplot as plt
+        import networkx as nx
+
+        graph = nx.Graph()
+        for cell, tile_type in self.known_tiles.items():
+            if tile_type is not TileType.WALL:
+                graph.add_node(cell)
+                graph.add_edges_from((cell, neighbour) for neighbour in self.free_neighbours(cell))
+        nx.draw(graph)
         plt.show()
 
 
@@ -171,6 +271,34 @@ class ExplorerAI:
         _map.show_as_ascii()
         _map.plot_it(animate_pause=10)
 
+    @classmethod
+    def map_out_whole_area_by_forking(cls, _map: Map, droid: RepairDroid):
+        """Flood fill the area breadth first, forking a droid into every new free cell.
+
+        No droid ever walks back, so each cell costs a single probe.
+        """
+        droids_to_expand = deque([droid])
+        while droids_to_expand:
+            explorer = droids_to_expand.popleft()
+            for direction in ALL_DIRECTIONS:
+                target_cell = _map.get_neighbour_cell(explorer.position, direction)
+                if target_cell in _map.known_tiles:
+                    continue
+                probe = explorer.fork()
+                feedback = probe.move_and_get_feedback(direction)
+                if feedback == 0:
+                    _map.add_tile(target_cell, TileType.WALL)
+                    continue
+                elif feedback == 1:
+                    _map.add_tile(target_cell, TileType.FREE)
+                elif feedback == 2:
+                    _map.add_tile(target_cell, TileType.OXYGEN)
+                else:
+                    raise RuntimeError()
+                droids_to_expand.append(probe)
+        print("Mapped area")
+        _map.show_as_ascii()
+
     @classmethod
     def find_shortest_sequence_of_directions_to_get_to_oxygen(
         cls, _map: Map, droid: RepairDroid
@@ -198,7 +326,7 @@ class ExplorerAI:
 
     @classmethod
     def get_directions_from_cell_to_cell(cls, _map: Map, from_cell, to_cell):
-        path = nx.shortest_path(_map.graph, from_cell, to_cell)
+        path = _map.distance_field(from_cell).path_to(to_cell)
         path.append(None)
         directions_iter = cls.get_directions_through_path(path)
         return directions_iter
@@ -247,19 +375,66 @@ class ExplorerAI:
             droid.move_and_get_feedback(opposite(direction))
 
 
-def part_1_and_2(inp):
+def part_1_and_2(inp, explore_by_forking=True):
     _map = Map()
     droid = RepairDroid(inp)
-    ExplorerAI.map_out_whole_area(_map, droid)
+    if explore_by_forking:
+        ExplorerAI.map_out_whole_area_by_forking(_map, droid)
+    else:
+        ExplorerAI.map_out_whole_area(_map, droid)
     shortest_path = ExplorerAI.find_shortest_sequence_of_directions_to_get_to_oxygen(
         _map, droid
     )
     p1 = len(list(shortest_path))
-    shortest_path_to_any = nx.single_source_shortest_path_length(_map.graph, (12, -12))
-    p2 = max(shortest_path_to_any.values())
+    oxygen_tile_coords = [
+        coord
+        for coord, tile_type in _map.known_tiles.items()
+        if tile_type is TileType.OXYGEN
+    ][0]
+    oxygen_field = DistanceField(oxygen_tile_coords, _map.free_neighbours)
+    oxygen_field.expand_all()
+    p2 = max(oxygen_field.distance.values())
     return p1, p2
 
 
+def test_distance_field(self):
+    # a U going north, east and back south from the start, with a wall at (1, 1) in the middle
+    _map = Map()
+    for cell in ((0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0)):
+        _map.add_tile(cell, TileType.FREE)
+    _map.add_tile((1, 1), TileType.WALL)
+    self.assertEqual((0, 0), _map.get_next_tile_with_unknown_neighbours((0, 0)))
+    field = _map.distance_field((0, 0))
+    self.assertEqual(6, len(field.path_to((2, 0))) - 1)
+    self.assertNotIn((1, 1), _map.frontier)
+    # a shortcut discovered later shortens the distances already settled
+    _map.add_tile((1, 0), TileType.FREE)
+    self.assertIs(field, _map.distance_field((0, 0)))
+    self.assertEqual([(0, 0), (1, 0), (2, 0), (2, 1)], field.path_to((2, 1)))
+    self.assertEqual((0, 0), _map.get_next_tile_with_unknown_neighbours((0, 0)))
+    # a corridor north to (0, 10), and a loop on the west side ending south of the origin, at (0, -2)
+    free = {(0, y) for y in range(11)} | {(-1, 0), (-2, 0), (-2, -1), (-2, -2), (-1, -2), (0, -2)}
+
+    def neighbours(cell):
+        x, y = cell
+        return [other for other in ((x, y + 1), (x, y - 1), (x - 1, y), (x + 1, y)) if other in free]
+
+    field = DistanceField((0, 0), neighbours)
+    field.expand_all()
+    self.assertEqual(6, field.distance[(0, -2)])
+    # the shortcut only shortens the loop, the corridor stays settled and reachable
+    free.add((0, -1))
+    field.add_cell((0, -1))
+    self.assertEqual((0, 10), field.nearest({(0, 10)}))
+    self.assertEqual(10, field.distance[(0, 10)])
+    self.assertEqual((0, -2), field.nearest({(0, 10), (0, -2)}))
+    self.assertEqual([(0, 0), (0, -1), (0, -2)], field.path_to((0, -2)))
+    self.assertEqual(10, len(field.path_to((0, 10))) - 1)
+    print("Distance field done")
+
+
 if __name__ == "__main__":
+    print("*** solving tests ***")
+    test_distance_field(TestCase())
     print("*** solving main ***")
     main("input")
@@ -1,5 +1,5 @@
 import itertools
-from typing import List
+import math
 from unittest import TestCase
 
 import numpy as np
@@ -47,24 +47,60 @@ def get_unit_digit(number):
     return abs(number) % 10
 
 
-def make_single_digit_array(signal_array):
-    single_digit_signal = np.array([get_unit_digit(num) for num in signal_array])
-    return single_digit_signal
+def fft_phase(signal, offset=0):
+    """Run one phase on the digits from `offset` on, `signal` holding only those.
 
-
-def part_1(inp, num_phases=100):
-    signal = np.array(inp)
+    The pattern of output digit i is made of blocks of i + 1 equal factors,
+    and is 0 before position i, so the digits before `offset` are not needed.
+    Each output digit is the alternating sum of its +1 and -1 blocks, every
+    block sum being a difference of the prefix sums. Digit i has about
+    length / (2 * (i + 1)) blocks, so a phase takes O(N log N), looping over
+    the blocks of each digit up to `threshold`, and over the block number,
+    for all the remaining digits at once, after it.
+    """
     length = len(signal)
-    pattern_matrix = np.stack(
-        [
-            np.fromiter(generate_repeating_pattern(row, length), "int8", length)
-            for row in range(length)
-        ]
-    )
+    end = offset + length
+    prefix = np.zeros(length + 1, dtype=np.int64)
+    np.cumsum(signal, out=prefix[1:])
+    output = np.zeros(length, dtype=np.int64)
+
+    def block_sums(starts, periods):
+        lower = np.minimum(starts, end) - offset
+        upper = np.minimum(starts + periods, end) - offset
+        return prefix[upper] - prefix[lower]
+
+    threshold = min(max(offset, int(np.sqrt(end / 2)) + 1), end)
+    for row in range(offset, threshold):
+        period = row + 1
+        sums = block_sums(np.arange(row, end, 2 * period), period)
+        output[row - offset] = sums[0::2].sum() - sums[1::2].sum()
+
+    rows = np.arange(threshold, end)
+    periods = rows + 1
+    block = 0
+    while len(rows):
+        # row i still has a block starting before the end while i + 2 * (i + 1) * block < end
+        num_rows = np.searchsorted(rows + 2 * periods * block, end)
+        rows, periods = rows[:num_rows], periods[:num_rows]
+        sums = block_sums(rows + 2 * periods * block, periods)
+        if block % 2 == 0:
+            output[threshold - offset:threshold - offset + num_rows] += sums
+        else:
+            output[threshold - offset:threshold - offset + num_rows] -= sums
+        block += 1
+    return np.abs(output) % 10
+
+
+def fft(signal, num_phases=100, offset=0):
+    """Run the phases on a full signal, and return its digits from `offset` on."""
+    signal = np.array(signal[offset:], dtype=np.int64)
     for _ in range(num_phases):
-        output_signal = np.matmul(signal, pattern_matrix.T)
-        output_signal_single_digit = make_single_digit_array(output_signal)
-        signal = output_signal_single_digit
+        signal = fft_phase(signal, offset)
+    return signal
+
+
+def part_1(inp, num_phases=100):
+    signal = fft(inp, num_phases)
     return "".join([str(n) for n in signal[0:8]])
 
 
@@ -73,40 +109,55 @@ def full_signal_iter(inp, repetitions):
         yield from inp
 
 
-def part_2_with_trick(inp, repetitions=10000, num_phases=100):
+def part_2_with_trick(inp, repetitions=10000, num_phases=100, method="cumsum"):
+    """Solve part 2 when the offset lies in the second half of the signal.
+
+    There every pattern is 0 before the digit and 1 after it, so each phase
+    is a cumulative sum from the end, mod 10. With `method="binomial"` the
+    phases are skipped altogether: after n phases, digit k is the sum of
+    C(n - 1 + j, j) * signal[k + j], and only the 8 digits asked for are
+    computed, with the binomial coefficients mod 10.
+    """
     offset = int("".join([str(v) for v in inp[0:7]]))
-    # print(f"offset is {offset}")
-    signal = list(full_signal_iter(inp, repetitions))
-    length = len(signal)
+    length = len(inp) * repetitions
     if not offset > length / 2:
         raise RuntimeError("cannot use the trick")
-    print("Can use the trick, but still can take a little while...")
-    signal = signal[offset:]
-    length = len(signal)
-    for n in range(num_phases):
-        # print(f"phase {n}")
-        output_list = [sum(signal)]
-        for digit, value in zip(range(1, length), signal):
-            digit_sum = output_list[-1] - value # would be faster to start from the end...
-            output_list.append(digit_sum)
-        signal = [abs(v) % 10 for v in output_list]
-
+    signal = np.take(np.array(inp, dtype=np.int32), np.arange(offset, length) % len(inp))
+    if method == "binomial":
+        coefficients = binomial_coefficients_mod_10(num_phases - 1, len(signal))
+        digits = [np.dot(coefficients[:len(signal) - k], signal[k:]) % 10 for k in range(8)]
+        return "".join([str(n) for n in digits])
+    if method != "cumsum":
+        raise ValueError(f"Unknown method {method}")
+    reversed_signal = signal[::-1]
+    for _ in range(num_phases):
+        # the digits are at most 9, so the sums fit in an int32 below 238M digits
+        np.cumsum(reversed_signal, out=reversed_signal)
+        np.remainder(signal, 10, out=signal)
     return "".join([str(n) for n in signal[0:8]])
 
 
-def generate_output_signal_array_mult_single(signal: List, length, offset):
-    signal_array = np.array(signal)
-    output_signal = list()
-    for digit_number in range(length):
-        if digit_number % 100 == 0:
-            pass
-            # print(f"Calculating digit number {digit_number}")
-        factors = np.fromiter(
-            generate_repeating_pattern(digit_number, length), "int8", length
-        )
-        scalar_product = np.dot(signal_array, factors)
-        output_signal.append(abs(scalar_product) % 10)
-    return output_signal
+def binomial_coefficients_mod_10(n, length):
+    """Return C(n + j, j) mod 10 for j in range(length), as an int64 array."""
+    ks = np.arange(length, dtype=np.int64)
+    modulo_2 = binomial_coefficients_mod_prime(n + ks, ks, 2)
+    modulo_5 = binomial_coefficients_mod_prime(n + ks, ks, 5)
+    # Chinese remainder theorem: 5 is 1 mod 2 and 0 mod 5, 6 is 0 mod 2 and 1 mod 5
+    return (5 * modulo_2 + 6 * modulo_5) % 10
+
+
+def binomial_coefficients_mod_prime(ns, ks, prime):
+    """Return C(ns, ks) mod prime elementwise, with Lucas' theorem."""
+    table = np.array(
+        [[math.comb(n, k) % prime for k in range(prime)] for n in range(prime)], dtype=np.int64
+    )
+    result = np.ones(len(ns), dtype=np.int64)
+    ns, ks = ns.copy(), ks.copy()
+    while ns.any():
+        result = result * table[ns % prime, ks % prime] % prime
+        ns //= prime
+        ks //= prime
+    return result
 
 
 def part_1_alt(inp, num_phases=100):
@@ -121,16 +172,9 @@ def part_2(inp, num_phases=100, repetitions=10000, is_part_1=False):
             )
         except RuntimeError:
             pass
-    offset = int("".join([str(v) for v in inp[0:7]]))
-    # print(f"offset is {offset}")
+    offset = 0 if is_part_1 else int("".join([str(v) for v in inp[0:7]]))
     signal = list(full_signal_iter(inp, repetitions))
-    length = len(signal)
-    for n in range(num_phases):
-        # print(f"phase {n}")
-        output_signal = generate_output_signal_array_mult_single(signal, length, offset)
-        signal = output_signal
-    if is_part_1:
-        return "".join([str(n) for n in signal[0:8]])
+    signal = fft(signal, num_phases, offset)
     return "".join([str(n) for n in signal[0:8]])
 
 
@@ -162,6 +206,32 @@ def test_sample_3(self):
     self.assertEqual(expected, part_1_alt(inp))
 
 
+def test_any_offset(self):
+    random = np.random.default_rng(16)
+    signal = random.integers(0, 10, 300)
+    expected = signal
+    for _ in range(3):
+        pattern_matrix = np.stack(
+            [np.fromiter(generate_repeating_pattern(row, len(signal)), "int8", len(signal)) for row in range(len(signal))]
+        )
+        expected = np.abs(pattern_matrix @ expected) % 10
+    for offset in (0, 5, 17, 100, 149, 150, 299):
+        self.assertEqual(list(expected[offset:]), list(fft(signal, num_phases=3, offset=offset)))
+    # an offset before the middle, where the trick does not apply
+    inp = [0, 0, 0, 0, 0, 2, 0] + list(signal[:13])
+    self.assertEqual("".join(str(n) for n in fft(inp * 50, 5)[20:28]), part_2(inp, num_phases=5, repetitions=50))
+
+
+def test_trick_methods(self):
+    for signal in ("03036732577212944063491565474664", "02935109699940807407585447034323"):
+        inp = [int(v) for v in signal]
+        cumsum = part_2_with_trick(inp, num_phases=10)
+        self.assertEqual(cumsum, part_2_with_trick(inp, num_phases=10, method="binomial"))
+        offset = int(signal[:7])
+        self.assertEqual(cumsum, "".join(str(n) for n in fft(inp * 10000, 10, offset)[:8]))
+    self.assertEqual("78725270", part_2_with_trick([int(v) for v in "02935109699940807407585447034323"], method="binomial"))
+
+
 def test_sample_4(self):
     print("Part 2 test...")
     inp = [int(v) for v in "03036732577212944063491565474664"]
@@ -175,6 +245,8 @@ if __name__ == "__main__":
     test_sample_1(TestCase())
     test_sample_2(TestCase())
     test_sample_3(TestCase())
+    test_any_offset(TestCase())
+    test_trick_methods(TestCase())
     test_sample_4(TestCase())
     print("*** solving main ***")
     main("input")
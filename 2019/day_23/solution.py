@@ -1,9 +1,8 @@
-import asyncio
 import dataclasses
-from typing import Dict
+from typing import Dict, List
 from unittest import TestCase
 
-from day_09.solution import IntcodeComputer
+from day_09.intcode import IntcodeCore, Status
 import logging
 
 logger = logging.getLogger("day_23")
@@ -39,123 +38,133 @@ class Package:
 
 
 class Network:
+    """Round-robin scheduler for the computers of the network.
+
+    Each computer runs until it blocks on input, and its packets are
+    delivered to the destination input queue straight away, so a run is
+    deterministic and never sleeps. The network is idle once
+    `idle_rounds_before_nat` full rounds went by in which every computer
+    started with an empty queue, got -1, and sent nothing. Computers that
+    halted are left out of the rounds, and packets sent to them are lost.
+    """
+
+    idle_rounds_before_nat = 2
+
     def __init__(self, inp, num_computers=50):
-        self.computers: Dict[int, IntcodeComputer] = {
-            n: IntcodeComputer(inp) for n in range(num_computers)
+        self.computers: Dict[int, IntcodeCore] = {
+            n: IntcodeCore(inp, name=f"computer {n}", jit=True) for n in range(num_computers)
         }
-        self.computer_tasks = {}
-        self.build_packages_helper_tasks = {}
-        self.package_sender_task = None
-        self.full_packages_queue: asyncio.Queue[Package] = asyncio.Queue()
-        self.part_1_answer = asyncio.Queue()
-        self.part_2_answer = asyncio.Queue()
+        self.partial_packages: Dict[int, List[int]] = {n: [] for n in self.computers}
+        self.halted = set()
+        self.first_package_255 = None
         self.last_package_255 = None
 
     def configure(self):
         for n, computer in self.computers.items():
-            computer.input_queue.put_nowait(n)
-            self.build_packages_helper_tasks[n] = asyncio.create_task(
-                self.build_packages_helper(
-                    computer.output_queue, self.full_packages_queue, n
-                )
-            )
-        self.package_sender_task = asyncio.create_task(self.package_sender())
-
-    async def package_sender(self):
-        logger.debug("Started package sender")
-        while True:
-            # need sleep or otherwise it deadlocks
-            await asyncio.sleep(0)
-            await self.forward_ready_packages_to_destination()
-            await self.feed_computers_with_empty_input_queues()
-
-    async def forward_ready_packages_to_destination(self):
-        while not self.full_packages_queue.empty():
-            package: Package = await self.full_packages_queue.get()
-            logger.debug(f"Received package {package}")
-            if package.destination == 255:
-                await self.part_1_answer.put(package.y)
-                self.last_package_255 = package
-            elif package.destination in self.computers:
-                await self.computers[package.destination].input_queue.put(package.x)
-                await self.computers[package.destination].input_queue.put(package.y)
-            else:
-                logger.error(f"Unknown destination {package.destination}")
-
-    async def nat(self):
-        sent_y_values = set()
-        while True:
-            await asyncio.sleep(0)
-            if self.full_packages_queue.empty():
-                # wait a bit to see if network is really idle...
-                await asyncio.sleep(0.1)
-                if self.full_packages_queue.empty():
-                    package_to_send: Package = self.last_package_255
-                    if package_to_send is None:
-                        continue
-                    package_to_send.destination = 0
-                    if package_to_send.y in sent_y_values:
-                        await self.part_2_answer.put(package_to_send.y)
-                    else:
-                        sent_y_values.add(package_to_send.y)
-                    logger.warning(f"Network is idle. Sending {package_to_send}.")
-                    await self.full_packages_queue.put(package_to_send)
-
-    async def feed_computers_with_empty_input_queues(self):
+            computer.provide_input(n)
+
+    def deliver(self, package: Package):
+        logger.debug(f"Received package {package}")
+        if package.destination == 255:
+            if self.first_package_255 is None:
+                self.first_package_255 = package
+            self.last_package_255 = package
+        elif package.destination in self.halted:
+            logger.warning(f"Destination {package.destination} halted, dropping {package}")
+        elif package.destination in self.computers:
+            self.computers[package.destination].provide_input(package.x)
+            self.computers[package.destination].provide_input(package.y)
+        else:
+            logger.error(f"Unknown destination {package.destination}")
+
+    def run_until_blocked(self, n) -> bool:
+        """Run computer n until it waits for input or halts, and return whether it sent anything."""
+        computer = self.computers[n]
+        partial_package = self.partial_packages[n]
+        computer.reset_cycles()
+        sent_packages = False
+        while (status := computer.run()) is Status.OUTPUT:
+            partial_package.append(computer.last_output)
+            if len(partial_package) == 3:
+                destination, x, y = partial_package
+                partial_package.clear()
+                self.deliver(Package(destination=destination, x=x, y=y))
+                sent_packages = True
+        if status is Status.HALTED:
+            logger.info(f"Computer {n} halted")
+            self.halted.add(n)
+        return sent_packages
+
+    def run_round(self) -> bool:
+        """Give every computer a turn, and return whether anything happened."""
+        active = False
         for n, computer in self.computers.items():
-            if computer.input_queue.empty():
-                await computer.input_queue.put(-1)
+            if n in self.halted:
+                continue
+            if computer.pending_input:
+                active = True
+            else:
+                computer.provide_input(-1)
+            active |= self.run_until_blocked(n)
+        return active
 
-    async def start_network_loop(self, is_part_1=False):
+    def start_network_loop(self, is_part_1=False):
         self.configure()
-        self.computer_tasks = {
-            n: asyncio.create_task(computer.execute())
-            for n, computer in self.computers.items()
-        }
-        self.nat_task = asyncio.create_task(self.nat())
-        if is_part_1:
-            return await self.part_1_answer.get()
-        return await self.part_2_answer.get()
-
-    async def build_packages_helper(
-        self,
-        queue_partial_packages: asyncio.Queue[int],
-        queue_full_packages: asyncio.Queue[Package],
-        computer_id,
-    ):
-        logger.debug(f"Starting package helper for computer {computer_id}")
+        idle_rounds = 0
+        last_y_sent_by_nat = None
         while True:
-            destination_id = await queue_partial_packages.get()
-            x = await queue_partial_packages.get()
-            y = await queue_partial_packages.get()
-            package = Package(x=x, y=y, destination=destination_id)
-            await queue_full_packages.put(package)
-
-
-async def main_loop(inp, is_part_1=False):
+            idle_rounds = 0 if self.run_round() else idle_rounds + 1
+            if len(self.halted) == len(self.computers):
+                raise RuntimeError("Every computer halted")
+            if is_part_1 and self.first_package_255 is not None:
+                return self.first_package_255.y
+            if idle_rounds < self.idle_rounds_before_nat or self.last_package_255 is None:
+                continue
+            package_to_send = dataclasses.replace(self.last_package_255, destination=0)
+            if package_to_send.y == last_y_sent_by_nat:
+                return package_to_send.y
+            last_y_sent_by_nat = package_to_send.y
+            logger.info(f"Network is idle. Sending {package_to_send}.")
+            self.deliver(package_to_send)
+            idle_rounds = 0
+
+
+def main_loop(inp, is_part_1=False):
     network = Network(inp)
-    return await network.start_network_loop(is_part_1=is_part_1)
+    return network.start_network_loop(is_part_1=is_part_1)
 
 
 def part_1(inp):
-    return asyncio.run(main_loop(inp, is_part_1=True))
+    return main_loop(inp, is_part_1=True)
 
 
 def part_2(inp):
-    return asyncio.run(main_loop(inp))
+    return main_loop(inp)
 
 
 def test_sample_1(self):
-    pass
+    # synthetic network: a packet travels 0 -> 1 -> ... -> 49 -> 255, with y growing by one per hop up to 200
+    inp = read_input("sample_1.txt")
+    self.assertEqual(149, part_1(inp))
 
 
 def test_sample_2(self):
-    pass
+    inp = read_input("sample_1.txt")
+    self.assertEqual(200, part_2(inp))
+
+
+def test_halted_computers(self):
+    # every computer but 0 halts right away; 0 sends (1, 2) to the NAT, then keeps reading
+    inp = [3, 100, 1005, 100, 16, 104, 255, 104, 1, 104, 2, 3, 101, 1105, 1, 11, 99]
+    network = Network(inp)
+    self.assertEqual(2, network.start_network_loop())
+    self.assertEqual(set(range(1, 50)), network.halted)
 
 
 if __name__ == "__main__":
     print("*** solving tests ***")
     test_sample_1(TestCase())
     test_sample_2(TestCase())
+    test_halted_computers(TestCase())
     print("*** solving main ***")
     main("input")
@@ -1,5 +1,4 @@
 import re
-import networkx as nx
 from parse import *
 import copy
 
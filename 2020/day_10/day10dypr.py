@@ -1,6 +1,4 @@
 import re
-import networkx as nx
-from parse import *
 import copy
 
 with open("input10.txt") as f:
@@ -1,6 +1,5 @@
 import os
 import re
-import networkx as nx
 from parse import *
 import copy
 from collections import defaultdict
@@ -1,13 +1,9 @@
 import re
-import networkx as nx
-from parse import *
 import copy
 from collections import defaultdict
 import itertools
-import numpy as np
 from math import cos, sin, pi
 from unittest import TestCase
-from sympy import Matrix, lcm
 
 
 def read_input(filename="input.txt"):
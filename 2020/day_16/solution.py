@@ -1,11 +1,8 @@
 import contextlib
 import re
-import networkx as nx
-from parse import *
 import copy
 from collections import defaultdict
 import itertools
-import numpy as np
 from math import cos, sin, pi
 from unittest import TestCase
 
@@ -1,10 +1,7 @@
 import re
-import networkx as nx
-from parse import *
 import copy
 from collections import defaultdict
 import itertools
-import numpy as np
 from math import cos, sin, pi
 import contextlib
 import functools
@@ -1,14 +1,10 @@
 import re
-import networkx as nx
-from parse import *
 import copy
 from collections import defaultdict
 import itertools
-import numpy as np
 from math import cos, sin, pi
 import contextlib
 from unittest import TestCase
-import lark
 
 
 def read_input(filename="input.txt"):
@@ -1,11 +1,8 @@
 from lark import Lark
 import re
-import networkx as nx
-from parse import *
 import copy
 from collections import defaultdict
 import itertools
-import numpy as np
 from math import cos, sin, pi
 import contextlib
 from unittest import TestCase
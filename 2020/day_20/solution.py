@@ -1,7 +1,5 @@
 import math
 import re
-import networkx as nx
-from parse import *
 import copy
 from collections import defaultdict
 import itertools
@@ -0,0 +1,88 @@
+"""Measure how long importing each day's solution takes, with `python -X importtime`.
+
+    python import_times.py 2019 2020 --top 3 --output import_times.json
+
+Every `day_*/*.py` file of the given years is imported in a fresh
+interpreter, from its own folder and with the year folder on the path, the
+way the solutions are run. Importing runs the module level code only, so
+this is the cold start a solution pays before solving anything. The
+slowest imports of each file are listed too, to show what to make lazy.
+Scripts that solve the puzzle at module level are reported as failed
+when their input is missing.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def parse_import_times(stderr):
+    """Yield (module, cumulative microseconds, nesting level) for every line of -X importtime output."""
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is not None:
+            _, cumulative, indent, name = match.groups()
+            yield name, int(cumulative), len(indent) // 2
+
+
+def interpreter_imports():
+    """Return the modules the interpreter imports on its own, before any solution code."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True)
+    return {name for name, _, _ in parse_import_times(result.stderr)}
+
+
+def measure(filename, year_folder, startup_imports):
+    folder, module = os.path.split(os.path.splitext(filename)[0])
+    environment = dict(os.environ, PYTHONPATH=year_folder)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=folder, env=environment, capture_output=True, text=True,
+    )
+    imports = []
+    total = None
+    for name, cumulative, level in parse_import_times(result.stderr):
+        if name == module and level == 0:
+            total = cumulative
+        elif level <= 1 and name not in startup_imports:
+            # imported by the solution itself, or by -c before it
+            imports.append((name, cumulative))
+    return {
+        "file": os.path.relpath(filename, ROOT),
+        "ok": result.returncode == 0,
+        "import_time_ms": None if total is None else total / 1000,
+        "slowest_imports": sorted(imports, key=lambda item: -item[1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("years", nargs="+", help="year folders, e.g. 2019")
+    parser.add_argument("--top", type=int, default=3, help="how many of the slowest imports to list")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+    results = []
+    startup_imports = interpreter_imports()
+    for year in args.years:
+        year_folder = os.path.join(ROOT, year)
+        for filename in sorted(glob.glob(os.path.join(year_folder, "day_*", "*.py"))):
+            if os.path.basename(filename) == "__init__.py":
+                continue
+            result = measure(filename, year_folder, startup_imports)
+            result["slowest_imports"] = result["slowest_imports"][:args.top]
+            results.append(result)
+            time_ms = "failed" if not result["ok"] else f"{result['import_time_ms']:8.1f} ms"
+            slowest = ", ".join(f"{name} {us / 1000:.0f} ms" for name, us in result["slowest_imports"])
+            print(f"{result['file']:40s}{time_ms:>12s}   {slowest}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()